@@ -1 +1,17 @@
-from .env import RandomDiscoMaze
+from importlib import import_module
+
+# the envs are imported on first access, so that the processes, which need
+#  only the maze generator or the bank, do not import gym
+__all__ = ['RandomDiscoMaze', 'VectorDiscoMaze']
+_modules = {'RandomDiscoMaze': '.env', 'VectorDiscoMaze': '.vector'}
+
+
+def __getattr__(name):
+    if name not in _modules:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    return getattr(import_module(_modules[name], __name__), name)
+
+
+def __dir__():
+    return sorted([*globals(), *__all__])
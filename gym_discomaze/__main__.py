@@ -122,6 +122,13 @@ def rollout(env, ctrl):
             return False
 
     print("reward %0.2f" % (total_reward))
+
+    # check that rendering keeps up with the 25 fps loop
+    viewer = env.unwrapped.viewer
+    if viewer.frame_times:
+        print("max frame time %0.2fms, %0.1f fps" % (
+            1e3 * max(viewer.frame_times), viewer.fps))
+
     return True
 
 
@@ -10,7 +10,8 @@ cimport numpy as np
 cimport cython
 np.import_array()
 
-from libc.stdint cimport uint32_t, uint16_t, uint8_t
+from libc.stdint cimport uint64_t, uint32_t, uint16_t, uint8_t
+from libc.stdint cimport int64_t, int32_t, int16_t, int8_t
 
 # lookup table of the number of set bits in a `uint8`
 cdef uint8_t *nbits = [
@@ -41,7 +42,7 @@ cdef uint8_t *nbits = [
 # modern numpy's prng
 from numpy.random cimport bitgen_t
 
-cdef uint32_t random_tomax(bitgen_t *rng, uint32_t max) nogil:
+cdef uint32_t random_tomax(bitgen_t *rng, uint32_t max) noexcept nogil:
     """Draw a random integer N with 0 <= N <= max.
 
     Details
@@ -69,7 +70,7 @@ cdef uint32_t random_tomax(bitgen_t *rng, uint32_t max) nogil:
     return value
 
 
-cdef uint32_t random_onehot(bitgen_t *rng, uint32_t mask) nogil:
+cdef uint32_t random_onehot(bitgen_t *rng, uint32_t mask) noexcept nogil:
     """Draw a random one-hot among the set bits of the given 32bit mask.
 
     If the mask represents a set P, then return the mask of a random singleton:
@@ -111,7 +112,7 @@ cdef enum:
     WSEN = W | S | E | N
 
 
-cdef uint16_t[:, ::1] random_perfect_maze(bitgen_t *rng, uint16_t[:, ::1] cells) nogil:
+cdef uint16_t[:, ::1] random_perfect_maze(bitgen_t *rng, uint16_t[:, ::1] cells) noexcept nogil:
     """Perfect Maze generator using random DFS.
 
     Details
@@ -208,7 +209,85 @@ cdef uint16_t[:, ::1] random_perfect_maze(bitgen_t *rng, uint16_t[:, ::1] cells)
     return cells
 
 
-cdef uint16_t[:, ::1] reset_rectangle_maze(uint16_t[:, ::1] cells) nogil:
+cdef void random_eller_maze(bitgen_t *rng, int32_t *left, int32_t *right,
+                            uint8_t[:, ::1] maze) noexcept nogil:
+    """Perfect Maze generator using Eller's algorithm.
+
+    Details
+    -------
+    Builds the binary maze one row of cells at a time, keeping only the sets
+    of the current row. The cells of each set are linked into a circular
+    list, `left` and `right`, in the order of their columns. The sets of a
+    row never cross, hence adjacent cells `c` and `c+1` are in the same set
+    iff `right[c] == c+1`. The working memory is two arrays of `m` ints.
+
+    Links
+    -----
+    http://www.neocomputer.org/projects/eller.html
+    https://weblog.jamisbuck.org/2010/12/29/maze-generation-eller-s-algorithm
+    """
+    cdef int n = maze.shape[0] >> 1, m = maze.shape[1] >> 1
+    cdef int r, c, x
+    cdef bint is_last, is_open
+
+    # the random decisions are the bits of the `uint32`-s
+    cdef uint32_t bits = 0
+    cdef int n_bits = 0
+
+    # the north border, and every cell in a set of its own
+    for x in range(2 * m + 1):
+        maze[0, x] = True
+
+    for c in range(m):
+        left[c], right[c] = c, c
+
+    for r in range(n):
+        is_last = r == n - 1
+
+        # join adjacent cells from distinct sets at random (the last row
+        #  joins all of them)
+        maze[2*r + 1, 0] = True
+        for c in range(m):
+            maze[2*r + 1, 2*c + 1] = False
+
+            is_open = False
+            if c + 1 < m and right[c] != c + 1:
+                if n_bits == 0:
+                    bits, n_bits = rng.next_uint32(rng.state), 32
+
+                is_open = is_last or (bits & 1)
+                bits, n_bits = bits >> 1, n_bits - 1
+
+            if is_open:
+                # splice the circular lists of the sets
+                right[left[c + 1]], left[right[c]] = right[c], left[c + 1]
+                right[c], left[c + 1] = c + 1, c
+
+            maze[2*r + 1, 2*c + 2] = not is_open
+
+        # open at least one cell of each set to the south: unlink the cells,
+        #  which are not the last in their sets, at random
+        maze[2*r + 2, 0] = True
+        for c in range(m):
+            maze[2*r + 2, 2*c + 2] = True
+
+            is_open = not is_last
+            if is_open and left[c] != c:
+                if n_bits == 0:
+                    bits, n_bits = rng.next_uint32(rng.state), 32
+
+                is_open = bits & 1
+                bits, n_bits = bits >> 1, n_bits - 1
+
+                if not is_open:
+                    # the cell starts a set of its own in the next row
+                    right[left[c]], left[right[c]] = right[c], left[c]
+                    left[c], right[c] = c, c
+
+            maze[2*r + 2, 2*c + 1] = not is_open
+
+
+cdef uint16_t[:, ::1] reset_rectangle_maze(uint16_t[:, ::1] cells) noexcept nogil:
     """Reset the rectangular array of cells."""
 
     cdef int r, c, n=cells.shape[0], m=cells.shape[1]
@@ -231,22 +310,107 @@ cdef uint16_t[:, ::1] reset_rectangle_maze(uint16_t[:, ::1] cells) nogil:
     return cells
 
 
-# https://numpy.org/doc/stable/reference/random/extending.html#cython
-from cpython.pycapsule cimport PyCapsule_IsValid, PyCapsule_GetPointer
+cdef uint8_t[:, ::1] render_maze(uint16_t[:, ::1] cells, uint8_t[:, ::1] maze) noexcept nogil:
+    """Build the binary maze from the cell data."""
+    cdef int r, c, cell, walls, n=cells.shape[0], m=cells.shape[1]
+    for r in range(2 * n + 1):
+        for c in range(2 * m + 1):
+            # only 'rooms' with odd coordinates correspond to cells
+            if not ((r & 1) and (c & 1)):
+                maze[r, c] = True
+                continue
+
+            # make the room passable
+            maze[r, c] = False
+
+            # knock down rooms' walls indicated by the cell's data
+            cell = cells[r >> 1, c >> 1]
+            walls = ((cell >> BORDER) | (cell >> WALL)) & WSEN
+            if not (walls & W):
+                maze[r, c-1] = False
+
+            if not (walls & E):
+                maze[r, c+1] = False
+
+            if not (walls & N):
+                maze[r-1, c] = False
+
+            if not (walls & S):
+                maze[r+1, c] = False
+
+    return maze
+
 
 @cython.embedsignature(True)
-def generate_perfect_maze(int n, int m, *, generator):
-    """Perfect Maze generator using random DFS."""
-    assert isinstance(generator, np.random.Generator)
+def passability(const uint8_t[:, ::1] walls, out=None):
+    """Get the open directions of each cell of the binary maze.
+
+    Details
+    -------
+    The bits `W, S, E, N` of a cell in the `uint8` table are set if its
+    neighbour in that direction is inside the maze and not a wall.
+    """
+    cdef Py_ssize_t n = walls.shape[0], m = walls.shape[1], r, c
+    if out is None:
+        out = np.empty((n, m), dtype=np.uint8)
+
+    if out.shape != (n, m) or out.dtype != np.uint8:
+        raise ValueError(f"`out` must be a {(n, m)} uint8 array")
+
+    cdef uint8_t[:, ::1] table = out
+    cdef uint8_t bits
+    with nogil:
+        for r in range(n):
+            for c in range(m):
+                bits = 0
+                if c > 0 and not walls[r, c-1]:
+                    bits |= W
+
+                if r + 1 < n and not walls[r+1, c]:
+                    bits |= S
+
+                if c + 1 < m and not walls[r, c+1]:
+                    bits |= E
 
+                if r > 0 and not walls[r-1, c]:
+                    bits |= N
+
+                table[r, c] = bits
+
+    return out
+
+
+# https://numpy.org/doc/stable/reference/random/extending.html#cython
+from cpython.pycapsule cimport PyCapsule_IsValid, PyCapsule_GetPointer
+
+cdef bitgen_t *get_bitgen(bit_generator) except NULL:
+    """Get the pointer to the C-level state of a numpy's bit generator."""
     cdef const char *capsule_name = "BitGenerator"
-    cdef bitgen_t *rng
 
-    capsule = generator.bit_generator.capsule
+    capsule = bit_generator.capsule
     if not PyCapsule_IsValid(capsule, capsule_name):
         raise ValueError("Invalid pointer to anon_func_state")
 
-    rng = <bitgen_t *> PyCapsule_GetPointer(capsule, capsule_name)
+    return <bitgen_t *> PyCapsule_GetPointer(capsule, capsule_name)
+
+
+def check_out(out, shape):
+    """Allocate the boolean output array, or validate the given one."""
+    if out is None:
+        return np.empty(shape, dtype=np.bool)
+
+    if out.shape != shape or out.dtype != np.bool:
+        raise ValueError(f"`out` must be a {shape} bool array")
+
+    return out
+
+
+@cython.embedsignature(True)
+def generate_perfect_maze(int n, int m, *, generator, out=None):
+    """Perfect Maze generator using random DFS."""
+    assert isinstance(generator, np.random.Generator)
+
+    cdef bitgen_t *rng = get_bitgen(generator.bit_generator)
 
     # generate cell representation of a rectangular perfect maze
     cdef uint16_t[:, ::1] cells = np.empty((n, m), dtype=np.uint16)
@@ -255,33 +419,383 @@ def generate_perfect_maze(int n, int m, *, generator):
         random_perfect_maze(rng, cells)
 
     # output maze is a boolean array
-    cdef uint8_t[:, ::1] maze = np.empty((2*n + 1, 2*m + 1), dtype=np.bool)
-    cdef int r, c, cell, walls
+    out = check_out(out, (2*n + 1, 2*m + 1))
+    cdef uint8_t[:, ::1] maze = out
     with nogil:
-        # build the binary maze from the cell data
-        for r in range(2 * n + 1):
-            for c in range(2 * m + 1):
-                # only 'rooms' with odd coordinates correspond to cells
-                if not ((r & 1) and (c & 1)):
-                    maze[r, c] = True
-                    continue
+        render_maze(cells, maze)
+
+    return out
+
+
+@cython.embedsignature(True)
+def generate_eller_maze(int n, int m, *, generator, out=None):
+    """Perfect Maze generator using Eller's algorithm.
+
+    Details
+    -------
+    The rows of the maze are written into `out` in order, hence it may be a
+    memory-mapped c-contiguous boolean array of shape `(2n+1, 2m+1)`, which
+    is paged out as it is filled. The working memory is O(m).
+    """
+    assert isinstance(generator, np.random.Generator)
+
+    cdef bitgen_t *rng = get_bitgen(generator.bit_generator)
+
+    out = check_out(out, (2*n + 1, 2*m + 1))
+    cdef uint8_t[:, ::1] maze = out
+    cdef int32_t[::1] sets = np.empty(2 * max(m, 1), dtype=np.int32)
+    with generator.bit_generator.lock, nogil:
+        random_eller_maze(rng, &sets[0], &sets[max(m, 1)], maze)
+
+    return out
+
+
+from cython.parallel cimport prange
+from libc.stdlib cimport malloc, free
+cimport openmp
+
+# a light-weight pcg32 bit generator for independent per-maze streams
+#  https://www.pcg-random.org/download.html#minimal-c-implementation
+cdef struct pcg32_state:
+    uint64_t state
+    uint64_t inc
+
+
+cdef uint32_t pcg32_next_uint32(void *st) noexcept nogil:
+    cdef pcg32_state *rng = <pcg32_state *> st
+    cdef uint64_t old = rng.state
+    rng.state = old * 6364136223846793005ULL + rng.inc
+
+    cdef uint32_t xorshifted = ((old >> 18) ^ old) >> 27
+    cdef uint32_t rot = old >> 59
+    return (xorshifted >> rot) | (xorshifted << ((-rot) & 31))
 
-                # make the room passable
-                maze[r, c] = False
 
-                # knock down rooms' walls indicated by the cell's data
-                cell = cells[r >> 1, c >> 1]
-                walls = ((cell >> BORDER) | (cell >> WALL)) & WSEN
-                if not (walls & W):
-                    maze[r, c-1] = False
+cdef void pcg32_seed(pcg32_state *rng, uint64_t seed, uint64_t seq) noexcept nogil:
+    # distinct odd increments select distinct streams
+    rng.state, rng.inc = 0, (seq << 1) | 1
+    pcg32_next_uint32(rng)
+    rng.state += seed
+    pcg32_next_uint32(rng)
 
-                if not (walls & E):
-                    maze[r, c+1] = False
 
-                if not (walls & N):
-                    maze[r-1, c] = False
+@cython.embedsignature(True)
+def generate_perfect_mazes(int k, int n, int m, *, seeds=None, out=None,
+                           int n_threads=0, bint eller=False):
+    """Generate a batch of perfect mazes in parallel using random DFS.
+
+    Details
+    -------
+    Each maze gets its own pcg32 stream keyed by the words drawn from the
+    seed sequence `seeds`, hence the output does not depend on the number
+    of threads. The mazes are written into `out`, which, if provided, must
+    be a c-contiguous boolean array of shape `(k, 2n+1, 2m+1)`. If `eller`
+    is set, then the mazes are generated by Eller's algorithm instead.
+    """
+    if not isinstance(seeds, np.random.SeedSequence):
+        seeds = np.random.SeedSequence(seeds)
+
+    out = check_out(out, (k, 2*n + 1, 2*m + 1))
+
+    if n_threads < 1:
+        n_threads = openmp.omp_get_max_threads()
+
+    # per-maze (seed, stream) keys
+    cdef uint64_t[:, ::1] keys = seeds.generate_state(
+        2 * k, np.uint64).reshape(k, 2)
+
+    cdef pcg32_state *states = <pcg32_state *> malloc(
+        max(k, 1) * sizeof(pcg32_state))
+    cdef bitgen_t *rngs = <bitgen_t *> malloc(max(k, 1) * sizeof(bitgen_t))
+    if states is NULL or rngs is NULL:
+        free(states)
+        free(rngs)
+        raise MemoryError
+
+    # either the cells of the dfs, or the sets of the rows for Eller's
+    cdef int j
+    cdef uint16_t[:, :, ::1] cells = np.empty(
+        (0 if eller else k, n, m), dtype=np.uint16)
+    cdef int32_t[:, ::1] sets = np.empty(
+        (k if eller else 0, 2 * max(m, 1)), dtype=np.int32)
+    cdef uint8_t[:, :, ::1] mazes = out
+    try:
+        for j in prange(k, nogil=True, schedule='dynamic',
+                        num_threads=n_threads):
+            # the dfs draws only `uint32`-s from the bit generator
+            pcg32_seed(&states[j], keys[j, 0], keys[j, 1])
+            rngs[j].state = &states[j]
+            rngs[j].next_uint32 = pcg32_next_uint32
+
+            if eller:
+                random_eller_maze(&rngs[j], &sets[j, 0],
+                                  &sets[j, max(m, 1)], mazes[j])
+
+            else:
+                reset_rectangle_maze(cells[j])
+                random_perfect_maze(&rngs[j], cells[j])
+                render_maze(cells[j], mazes[j])
+
+    finally:
+        free(states)
+        free(rngs)
+
+    return out
+
+
+# object ids on the maze map, which is of the narrowest signed integer type
+cdef enum:
+    ID_WALL = -1, ID_EMPTY = 0
+
+
+cdef inline int64_t get_id(char *ptr, int itemsize) noexcept nogil:
+    if itemsize == 1:
+        return (<int8_t *> ptr)[0]
+
+    elif itemsize == 2:
+        return (<int16_t *> ptr)[0]
+
+    elif itemsize == 4:
+        return (<int32_t *> ptr)[0]
+
+    return (<int64_t *> ptr)[0]
+
+
+cdef inline void set_id(char *ptr, int itemsize, int64_t value) noexcept nogil:
+    if itemsize == 1:
+        (<int8_t *> ptr)[0] = <int8_t> value
+
+    elif itemsize == 2:
+        (<int16_t *> ptr)[0] = <int16_t> value
+
+    elif itemsize == 4:
+        (<int32_t *> ptr)[0] = <int32_t> value
+
+    else:
+        (<int64_t *> ptr)[0] = value
+
+
+@cython.embedsignature(True)
+def move_object(np.ndarray map, Py_ssize_t i, Py_ssize_t j,
+                Py_ssize_t di, Py_ssize_t dj, np.ndarray is_target):
+    """Move the object at `(i, j)` on the map by `(di, dj)`.
+
+    Details
+    -------
+    Implements the rules of the Random Disco Maze: the target at destination
+    is consumed, the wall is displaced, and the object relocates only to
+    unobstructed cells. The ids of the live targets are flagged by nonzero
+    values in the `uint8` array `is_target`.
+
+    The move holds the GIL, since it is far too short to release it, hence
+    stepping the envs in a thread pool does not scale with it. Of a step,
+    only the full-map lookups of the repaint, see `lookup`, run without
+    the GIL.
+
+    Returns
+    -------
+    dest_id, u, v, reward, is_dead
+        The id of the destination's content, the new position of the object,
+        the reward for consuming a target and the flag of a wall collision.
+    """
+    # displacing self is always successful
+    if di == 0 and dj == 0:
+        return ID_EMPTY, i, j, 0., False
+
+    # access the raw data, since typed memoryviews are slow to acquire
+    if map.ndim != 2 or not np.PyArray_ISSIGNED(map):
+        raise TypeError("`map` must be a 2d array of signed integers")
+
+    if is_target.ndim != 1 or np.PyArray_TYPE(is_target) != np.NPY_UINT8:
+        raise TypeError("`is_target` must be a 1d `uint8` array")
+
+    cdef Py_ssize_t u = i + di, v = j + dj
+    if not (0 <= i < map.shape[0] and 0 <= u < map.shape[0]
+            and 0 <= j < map.shape[1] and 0 <= v < map.shape[1]):
+        raise IndexError(f"({i}, {j}) -> ({u}, {v}) is out of bounds")
+
+    cdef int itemsize = np.PyArray_ITEMSIZE(map)
+    cdef char *src = np.PyArray_BYTES(map) + i * map.strides[0] \
+                                           + j * map.strides[1]
+    cdef char *dst = np.PyArray_BYTES(map) + u * map.strides[0] \
+                                           + v * map.strides[1]
+    cdef uint8_t *flags = <uint8_t *> np.PyArray_BYTES(is_target)
+    cdef Py_ssize_t n_flags = is_target.shape[0], stride = is_target.strides[0]
+
+    cdef int64_t dest = get_id(dst, itemsize)
+    cdef bint hit_target = 0 < dest < n_flags and flags[dest * stride]
+
+    # consume the target or displace the wall
+    if hit_target or dest == ID_WALL:
+        set_id(dst, itemsize, ID_EMPTY)
+
+    # can relocate to non-obstructed tiles only
+    if get_id(dst, itemsize) == ID_EMPTY:
+        set_id(dst, itemsize, get_id(src, itemsize))
+        set_id(src, itemsize, ID_EMPTY)
+
+    else:
+        u, v = i, j
+
+    return dest, u, v, (1. if hit_target else 0.), dest == ID_WALL
+
+
+cdef inline int64_t get_index(char *ptr, int itemsize,
+                              bint is_signed) noexcept nogil:
+    if is_signed:
+        return get_id(ptr, itemsize)
+
+    if itemsize == 1:
+        return (<uint8_t *> ptr)[0]
+
+    elif itemsize == 2:
+        return (<uint16_t *> ptr)[0]
+
+    elif itemsize == 4:
+        return (<uint32_t *> ptr)[0]
+
+    return <int64_t> (<uint64_t *> ptr)[0]
+
+
+@cython.embedsignature(True)
+def lookup(np.ndarray table, np.ndarray index, np.ndarray out):
+    """Look the rows of the table up by the indices, and write them to `out`.
+
+    Details
+    -------
+    Computes `out[i, j] = table[index[i, j]]` for the 2d `uint8` table and
+    the 2d array of integer indices of any width, like `np.take(table,
+    index, axis=0, out=out)`, but without converting the indices to `intp`
+    and without the GIL. The negative indices count from the end of the
+    table. Raises `IndexError` if an index is outside of the table.
+    """
+    if table.ndim != 2 or np.PyArray_TYPE(table) != np.NPY_UINT8:
+        raise TypeError("`table` must be a 2d `uint8` array")
+
+    if index.ndim != 2 or not np.PyArray_ISINTEGER(index):
+        raise TypeError("`index` must be a 2d array of integers")
+
+    if out.ndim != 3 or np.PyArray_TYPE(out) != np.NPY_UINT8 \
+            or not np.PyArray_ISWRITEABLE(out):
+        raise TypeError("`out` must be a writeable 3d `uint8` array")
+
+    cdef Py_ssize_t n = table.shape[0], c = table.shape[1]
+    cdef Py_ssize_t h = index.shape[0], w = index.shape[1]
+    if out.shape[0] != h or out.shape[1] != w or out.shape[2] != c:
+        raise ValueError(f"`out` must have shape {(h, w, c)}")
+
+    cdef char *tab = np.PyArray_BYTES(table)
+    cdef char *src = np.PyArray_BYTES(index)
+    cdef char *dst = np.PyArray_BYTES(out)
+    cdef Py_ssize_t t0 = table.strides[0], t1 = table.strides[1]
+    cdef Py_ssize_t s0 = index.strides[0], s1 = index.strides[1]
+    cdef Py_ssize_t d0 = out.strides[0], d1 = out.strides[1]
+    cdef Py_ssize_t d2 = out.strides[2]
+
+    cdef int itemsize = np.PyArray_ITEMSIZE(index)
+    cdef bint is_signed = np.PyArray_ISSIGNED(index), is_bad = False
+    cdef Py_ssize_t i, j, k
+    cdef int64_t x
+    with nogil:
+        for i in range(h):
+            for j in range(w):
+                x = get_index(src + i * s0 + j * s1, itemsize, is_signed)
+                if x < 0:
+                    x += n
+
+                if not 0 <= x < n:
+                    is_bad = True
+                    break
+
+                for k in range(c):
+                    dst[i * d0 + j * d1 + k * d2] = tab[x * t0 + k * t1]
+
+            if is_bad:
+                break
+
+    if is_bad:
+        raise IndexError(f"`index` is out of bounds for a table of {n} rows")
+
+    return out
+
+
+@cython.embedsignature(True)
+def spanning_tree(const uint8_t[:, ::1] free, Py_ssize_t i, Py_ssize_t j):
+    """Traverse the free cells of a perfect maze from `(i, j)` with DFS.
+
+    Details
+    -------
+    The free cells of a perfect maze form a tree, which this function roots
+    at `(i, j)` in linear time. The cells are indexed in the flat c-order,
+    and their `parent`, `depth`, preorder index `tin` and the last preorder
+    index in their subtree `tout` are -1 if they are not reachable.
+
+    Raises `ValueError` if the free cells contain a cycle.
+
+    Returns
+    -------
+    parent, depth, tin, tout
+        The flat int32 arrays describing the rooted tree.
+    """
+    cdef Py_ssize_t n = free.shape[0], m = free.shape[1]
+    if not (0 <= i < n and 0 <= j < m and free[i, j]):
+        raise ValueError(f"The root ({i}, {j}) is not a free cell")
+
+    parent = np.full(n * m, -1, dtype=np.int32)
+    depth = np.full(n * m, -1, dtype=np.int32)
+    tin = np.full(n * m, -1, dtype=np.int32)
+    tout = np.full(n * m, -1, dtype=np.int32)
+
+    cdef int32_t[::1] par = parent, dep = depth, pre = tin, post = tout
+    cdef int32_t[::1] stack = np.empty(n * m, dtype=np.int32)
+    cdef uint8_t[::1] cursor = np.zeros(n * m, dtype=np.uint8)
+
+    cdef Py_ssize_t sp = 1, t = 1, x, y, r, c
+    cdef bint is_tree = True
+    with nogil:
+        x = i * m + j
+        stack[0], dep[x], pre[x] = x, 0, 0
+        while sp > 0:
+            x = stack[sp - 1]
+
+            # leave the cell after visiting all of its neighbours
+            if cursor[x] == 4:
+                post[x] = t - 1
+                sp -= 1
+                continue
+
+            # visit the next neighbour: west, south, east or north
+            r, c = x // m, x % m
+            if cursor[x] == 0:
+                c -= 1
+
+            elif cursor[x] == 1:
+                r += 1
+
+            elif cursor[x] == 2:
+                c += 1
+
+            else:
+                r -= 1
+
+            cursor[x] += 1
+            if not (0 <= r < n and 0 <= c < m and free[r, c]):
+                continue
+
+            y = r * m + c
+            if y == par[x]:
+                continue
+
+            # a visited cell, which is not the parent, closes a cycle
+            if pre[y] >= 0:
+                is_tree = False
+                break
+
+            par[y], dep[y], pre[y] = x, dep[x] + 1, t
+            stack[sp] = y
+            sp, t = sp + 1, t + 1
 
-                if not (walls & S):
-                    maze[r+1, c] = False
+    if not is_tree:
+        raise ValueError("The free cells do not form a tree")
 
-    return np.asarray(maze)
+    return parent, depth, tin, tout
@@ -0,0 +1,121 @@
+import struct
+import numpy as np
+
+from . import maze
+
+
+# file header: magic, format version, maze dims and the number of mazes
+HEADER = struct.Struct('<8sIIIQ')
+MAGIC, VERSION, OFFSET = b'DISCOMAZ', 1, 64  # the data are 64-byte aligned
+
+
+class MazeBank:
+    """A read-only bank of pre-generated perfect mazes on disk.
+
+    Details
+    -------
+    The file consists of a short header followed by the wall layouts, each
+    bit-packed into a row of bytes. The rows are memory-mapped, so that
+    many worker processes opening the same bank share the page cache, and
+    a layout is unpacked only when it is accessed.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+
+        if len(header) != HEADER.size or header[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'`{path}` is not a maze bank')
+
+        _, version, self.n_row, self.n_col, n_mazes = HEADER.unpack(header)
+        if version != VERSION:
+            raise ValueError(f'Unsupported maze bank version {version}')
+
+        n_bits = (1 + 2 * self.n_row) * (1 + 2 * self.n_col)
+        data = np.memmap(path, dtype=np.uint8, mode='r', offset=OFFSET,
+                         shape=(n_mazes, (n_bits + 7) // 8))
+
+        # a plain array view skips `memmap`'s slow slicing
+        self.data = data.view(np.ndarray)
+
+    @property
+    def shape(self):
+        return 1 + 2 * self.n_row, 1 + 2 * self.n_col
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        text = 'x'.join(map(str, self.shape))
+        return type(self).__name__ + f'({len(self)} of {text})'
+
+    def __getitem__(self, index):
+        """Get the boolean wall layout(s) at the index."""
+        packed = self.data[index]
+        walls = np.unpackbits(packed, axis=-1, count=np.prod(self.shape))
+        return walls.view(bool).reshape(*packed.shape[:-1], *self.shape)
+
+    def sample(self, generator):
+        """Draw a random wall layout from the bank."""
+        return self[generator.integers(len(self))]
+
+
+def build(path, n_mazes, n_row, n_col, *, generator=None, chunk=4096,
+          n_threads=0):
+    """Generate a bank of random perfect mazes and save it to the path."""
+    assert n_mazes > 0 and chunk > 0
+
+    # re-package the random bit generator from the legacy random state
+    if isinstance(generator, np.random.RandomState):
+        generator = generator._bit_generator
+    generator = np.random.default_rng(generator)
+
+    header = HEADER.pack(MAGIC, VERSION, n_row, n_col, n_mazes)
+    with open(path, 'wb') as f:
+        f.write(header.ljust(OFFSET, b'\0'))
+
+        # generate the mazes in parallel batches and pack them bitwise
+        buffer = np.empty((chunk, 1 + 2 * n_row, 1 + 2 * n_col), dtype=bool)
+        for j in range(0, n_mazes, chunk):
+            out = buffer[:min(chunk, n_mazes - j)]
+            maze.generate(n_row, n_col, size=len(out), out=out,
+                          generator=generator, n_threads=n_threads)
+
+            f.write(np.packbits(out.reshape(len(out), -1), axis=-1).data)
+
+    return MazeBank(path)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Build a bank of random perfect mazes.',
+        add_help=True)
+
+    parser.add_argument(
+        'path', type=str,
+        help='the file to save the maze bank to.')
+
+    parser.add_argument(
+        '--n_mazes', type=int, required=False, default=65536,
+        help='the number of mazes in the bank.')
+
+    parser.add_argument(
+        '--n_row', type=int, required=False, default=15,
+        help='the number of rows in the maze.')
+
+    parser.add_argument(
+        '--n_col', type=int, required=False, default=15,
+        help='the number of columns in the maze.')
+
+    parser.add_argument(
+        '--seed', type=int, required=False, default=None,
+        help='PRNG seed to use.')
+
+    parser.add_argument(
+        '--n_threads', type=int, required=False, default=0,
+        help='the number of generator threads (zero means all cores).')
+
+    args = parser.parse_args()
+    print(build(args.path, args.n_mazes, args.n_row, args.n_col,
+                generator=args.seed, n_threads=args.n_threads))
@@ -0,0 +1,454 @@
+"""Benchmarks of the maze generator and the environments.
+
+Run the suite and save the results
+    python -m gym_discomaze.bench --output new.json
+
+Compare against the results of another commit
+    python -m gym_discomaze.bench --compare old.json new.json
+
+Time the batch generator with 1, 2 and 8 threads (besides all cores)
+    python -m gym_discomaze.bench --only maze --threads 1 2 8
+
+Time the generators on very large mazes, written to a memory-mapped file
+    python -m gym_discomaze.bench --only maze_large --large 1000 5000
+
+The run fails if the startup times exceed their `BUDGETS`.
+"""
+import os
+import gc
+import sys
+import json
+import time
+import platform
+import tracemalloc
+import subprocess
+
+import numpy as np
+
+from . import maze
+from .env import MazeMap, RandomDiscoMaze
+from .ext import RandomDiscoGoal
+from .ext import ExploreRandomDiscoMaze
+from .ext import RandomDiscoMazeWithPosition
+
+
+# the envs and their swept parameters (besides the size)
+ENVS = {
+    'RandomDiscoMaze': (
+        RandomDiscoMaze, ('n_targets', 'n_colors', 'field', 'color_stream',
+                          'walls_only', 'frame_stack')),
+    'RandomDiscoGoal': (
+        RandomDiscoGoal, ('n_colors',)),
+    'ExploreRandomDiscoMaze': (
+        ExploreRandomDiscoMaze, ('n_colors', 'field')),
+    'RandomDiscoMazeWithPosition': (
+        RandomDiscoMazeWithPosition, ('n_targets', 'n_colors', 'field')),
+}
+
+# the default config, and the values of each parameter in the sweep
+DEFAULTS = dict(n_targets=1, n_colors=5, field=None, color_stream=False,
+                walls_only=False, frame_stack=None)
+SWEEP = dict(n_targets=(1, 5), n_colors=(5, 16), field=(None, (2, 2)),
+             color_stream=(False, True), walls_only=(False, True),
+             frame_stack=(None, 4))
+
+# the numbers of threads of the batch generator timed for the scaling, in
+#  addition to all cores
+THREADS = 1, 2, 4
+
+
+# the budgets of the startup phases in seconds: importing the package, the
+#  env (which imports gym), and constructing the first env
+BUDGETS = {'import': 0.05, 'import_env': 1.0, 'construct': 0.05}
+
+STARTUP = '''
+import time, resource
+t0 = time.perf_counter()
+import gym_discomaze
+t1 = time.perf_counter()
+from gym_discomaze import RandomDiscoMaze
+t2 = time.perf_counter()
+RandomDiscoMaze(15, 15)
+t3 = time.perf_counter()
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+print(t1 - t0, t2 - t1, t3 - t2, peak)
+'''
+
+LARGE = '''
+import sys, time, resource, tempfile, numpy as np
+from gym_discomaze import maze
+n, algorithm = int(sys.argv[1]), sys.argv[2]
+with tempfile.TemporaryFile() as f:
+    out = np.memmap(f, dtype=bool, mode='w+', shape=(2 * n + 1, 2 * n + 1))
+    t0 = time.perf_counter()
+    maze.generate(n, n, generator=0, out=out, algorithm=algorithm)
+    t1 = time.perf_counter()
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+print(t1 - t0, peak)
+'''
+
+
+def configs(params):
+    """Vary one parameter at a time around the defaults."""
+    yield {k: DEFAULTS[k] for k in params}
+    for k in params:
+        for value in SWEEP[k]:
+            if value != DEFAULTS[k]:
+                yield {**{k: DEFAULTS[k] for k in params}, k: value}
+
+
+def measure(fn, *, min_time=0.2, repeat=3):
+    """Get the best rate of calls per second and the peak memory of a call.
+
+    Details
+    -------
+    The number of calls per run is doubled until a run lasts `min_time`
+    seconds, and the rate is the best of `repeat` runs. The peak memory of
+    a single call is traced separately, since tracing slows down numpy.
+    """
+    fn()  # warm-up
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+
+    finally:
+        tracemalloc.stop()
+
+    number, elapsed = 1, 0.
+    while True:
+        elapsed = timed(fn, number)
+        if elapsed >= min_time:
+            break
+        number *= 2
+
+    for _ in range(repeat - 1):
+        elapsed = min(elapsed, timed(fn, number))
+
+    return number / elapsed, peak - base
+
+
+def timed(fn, number):
+    gcold = gc.isenabled()
+    gc.disable()
+    try:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        return time.perf_counter() - t0
+
+    finally:
+        if gcold:
+            gc.enable()
+
+
+def oscillate(env):
+    """Get a pair of actions that move the player back and forth."""
+    i, j = env.objects[env.PLAYER]
+    for a, d in enumerate(env.directions):
+        _, opposite, di, dj = maze.ATLAS[d]
+        if (di or dj) and env.maze[i + di, j + dj] != env.maze.WALL:
+            return a, env.directions.index(opposite)
+
+    # the player is walled in, e.g. in a 1x1 maze
+    return 0, 0
+
+
+def fresh(script, *args, repeat=3):
+    """Run the script in fresh interpreters, and get the best of its outputs.
+    """
+    # make sure that the interpreter imports this very package
+    path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        filter(None, [path, os.environ.get('PYTHONPATH')])))
+
+    runs = []
+    for _ in range(max(repeat, 1)):
+        out = subprocess.run([sys.executable, '-c', script, *map(str, args)],
+                             env=env, capture_output=True, text=True,
+                             check=True)
+        runs.append(list(map(float, out.stdout.split())))
+
+    return np.min(runs, axis=0)
+
+
+def bench_startup(*, repeat=3, **ignore):
+    """Time the imports and the first env in fresh interpreters.
+
+    Details
+    -------
+    Reports the best of `repeat` runs, and the peak resident memory of
+    the interpreter, rather than of a call.
+    """
+    *times, peak = fresh(STARTUP, repeat=repeat)
+    for phase, seconds in zip(BUDGETS, times):
+        yield phase, (1 / seconds, int(peak))
+
+
+def bench_maze(size, *, generator, algorithm='dfs', threads=THREADS,
+               **kwargs):
+    """Benchmark the maze generator and `MazeMap` construction.
+
+    Details
+    -------
+    The batch generator is timed on all cores, and with each number of
+    `threads` as `generate_batch_t{n}`, for the scaling with the threads.
+    """
+    yield 'generate', measure(lambda: maze.generate(
+        size, size, generator=generator, algorithm=algorithm), **kwargs)
+
+    # report the rate of mazes, rather than batches (zero threads means all
+    #  cores)
+    for n_threads in (0, *threads):
+        rate, peak = measure(lambda: maze.generate(
+            size, size, generator=generator, size=64, algorithm=algorithm,
+            n_threads=n_threads), **kwargs)
+        suffix = f'_t{n_threads}' if n_threads else ''
+        yield 'generate_batch' + suffix, (64 * rate, peak)
+
+    yield 'MazeMap', measure(lambda: MazeMap(
+        size, size, generator=generator, algorithm=algorithm), **kwargs)
+
+
+def bench_large(size, *, algorithm='dfs', repeat=3, **ignore):
+    """Time a single very large maze written to a memory-mapped file.
+
+    Details
+    -------
+    Reports the peak resident memory of the interpreter, which includes the
+    pages of the mapped output.
+    """
+    seconds, peak = fresh(LARGE, size, algorithm, repeat=repeat)
+    yield 'generate', (1 / seconds, int(peak))
+
+
+def bench_env(cls, size, config, *, generator, **kwargs):
+    """Benchmark the env's reset, step, update and observation."""
+    env = cls(size, size, generator=generator, **config)
+
+    # the goal env wraps a core env
+    core = env.env if isinstance(env, RandomDiscoGoal) else env
+
+    yield 'reset', measure(env.reset, **kwargs)
+
+    env.reset()
+    actions, t = oscillate(core), 0
+
+    def step():
+        nonlocal actions, t
+        _, _, done, _ = env.step(actions[t & 1])
+        t += 1
+        if done:
+            env.reset()
+            actions, t = oscillate(core), 0
+
+    yield 'step', measure(step, **kwargs)
+
+    yield 'update', measure(core.update, **kwargs)
+
+    observe = env._obs if isinstance(env, RandomDiscoGoal) else env.observation
+    yield 'observation', measure(observe, **kwargs)
+
+
+def selected(name, bench=None, *, only=None):
+    """Check if the suite, or its benchmark, passes the `only` filters.
+
+    Details
+    -------
+    A filter selects the suites whose names contain it, e.g. `maze` selects
+    `maze` and `maze_large`, or a single benchmark by its full name, e.g.
+    `startup.import`.
+    """
+    if only is None:
+        return True
+
+    if bench is None:
+        return any(s in name or s.startswith(name + '.') for s in only)
+
+    return any(s in name or s == f'{name}.{bench}' for s in only)
+
+
+def run(sizes=(5, 15, 31), *, only=None, seed=None, large=(),
+        threads=THREADS, **kwargs):
+    """Run the benchmark suite and return the results."""
+    generator = np.random.default_rng(seed)
+
+    kwargs.update(generator=generator)
+
+    algorithms = [{}, {'algorithm': 'eller'}]
+    suites = [('maze', lambda n, config: bench_maze(
+        n, **config, threads=threads, **kwargs), algorithms)]
+    for name, (cls, params) in ENVS.items():
+        suites.append((name, lambda n, config, cls=cls: bench_env(
+            cls, n, config, **kwargs), list(configs(params))))
+
+    results = []
+    if selected('startup', only=only):
+        for bench, (rate, peak) in bench_startup(**kwargs):
+            if not selected('startup', bench, only=only):
+                continue
+
+            results.append(dict(name=f'startup.{bench}', config={},
+                                rate=rate, peak_bytes=peak,
+                                budget=BUDGETS[bench]))
+            print(format_result(results[-1]), file=sys.stderr)
+
+    # the large mazes have sizes of their own, and run only if requested
+    suites.append(('maze_large', lambda n, config: bench_large(
+        n, **config, **kwargs), algorithms))
+
+    for name, suite, grid in suites:
+        if not selected(name, only=only):
+            continue
+
+        for n in (large if name == 'maze_large' else sizes):
+            for config in grid:
+                config = dict(size=n, **config)
+                for bench, (rate, peak) in suite(n, {
+                    k: v for k, v in config.items() if k != 'size'
+                }):
+                    if not selected(name, bench, only=only):
+                        continue
+
+                    results.append(dict(name=f'{name}.{bench}',
+                                        config=config, rate=rate,
+                                        peak_bytes=peak))
+                    print(format_result(results[-1]), file=sys.stderr)
+
+    return dict(meta=metadata(), results=results)
+
+
+def metadata():
+    """Describe the environment the benchmarks were run in."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True, cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return dict(commit=commit, time=time.strftime('%Y-%m-%dT%H:%M:%S'),
+                python=platform.python_version(), numpy=np.__version__,
+                machine=platform.machine(), processor=platform.processor())
+
+
+def over_budget(results):
+    """Get the results that take longer than their budget."""
+    return [r for r in results if 'budget' in r
+            and 1 / r['rate'] > r['budget']]
+
+
+def key(result):
+    return result['name'], json.dumps(result['config'], sort_keys=True)
+
+
+def format_config(config):
+    return ','.join(f'{k}={v}' for k, v in config.items()).replace(' ', '')
+
+
+def format_result(result):
+    text = (f"{result['name']:40s} {format_config(result['config']):64s}"
+            f" {result['rate']:12.1f}/s {result['peak_bytes']:10d} B")
+    if over_budget([result]):
+        text += f" <-- over the budget of {result['budget']}s"
+
+    return text
+
+
+def compare(old, new, *, threshold=0.1):
+    """Print the relative change of rates, and return the regressions."""
+    base = {key(r): r for r in old['results']}
+
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+    regressions = []
+    for result in new['results']:
+        if key(result) not in base:
+            continue
+
+        ratio = result['rate'] / base[key(result)]['rate']
+        flag = ''
+        if ratio < 1 - threshold:
+            flag = ' <-- regression'
+            regressions.append(result)
+
+        print(f"{result['name']:40s} {format_config(result['config']):64s}"
+              f" {base[key(result)]['rate']:12.1f} {result['rate']:12.1f}"
+              f" x{ratio:5.2f}{flag}")
+
+    return regressions
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Benchmark the maze generator and the environments.',
+        add_help=True)
+
+    parser.add_argument(
+        '--output', type=str, required=False, default=None,
+        help='the json file to save the results to.')
+
+    parser.add_argument(
+        '--compare', type=str, nargs='+', required=False, default=None,
+        help='compare against the base results, or compare two results.')
+
+    parser.add_argument(
+        '--threshold', type=float, required=False, default=0.1,
+        help='the relative slowdown reported as a regression.')
+
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', required=False, default=[5, 15, 31],
+        help='the sizes of the square mazes.')
+
+    parser.add_argument(
+        '--large', type=int, nargs='+', required=False, default=[],
+        help='the sizes of the very large mazes, e.g. `5000`.')
+
+    parser.add_argument(
+        '--threads', type=int, nargs='*', required=False,
+        default=list(THREADS),
+        help='the numbers of threads of the batch maze generator.')
+
+    parser.add_argument(
+        '--only', type=str, nargs='+', required=False, default=None,
+        help='run only the suites with these names, e.g. `maze`, or the '
+             'benchmarks with these full names, e.g. `startup.import`.')
+
+    parser.add_argument(
+        '--min_time', type=float, required=False, default=0.2,
+        help='the minimal duration of a timed run in seconds.')
+
+    parser.add_argument(
+        '--repeat', type=int, required=False, default=3,
+        help='the number of timed runs.')
+
+    parser.add_argument(
+        '--seed', type=int, required=False, default=None,
+        help='PRNG seed to use.')
+
+    args = parser.parse_args()
+
+    # compare two saved results without running the benchmarks
+    if args.compare is not None and len(args.compare) > 1:
+        old, new = (json.load(open(path)) for path in args.compare[:2])
+        sys.exit(1 if compare(old, new, threshold=args.threshold) else 0)
+
+    new = run(args.sizes, only=args.only, seed=args.seed, large=args.large,
+              threads=args.threads, min_time=args.min_time,
+              repeat=args.repeat)
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(new, f, indent=2)
+
+    failed = over_budget(new['results'])
+    if args.compare is not None:
+        old = json.load(open(args.compare[0]))
+        failed += compare(old, new, threshold=args.threshold)
+
+    sys.exit(1 if failed else 0)
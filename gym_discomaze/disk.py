@@ -0,0 +1,166 @@
+import struct
+import numpy as np
+
+from . import maze
+from .env import MazeMap
+
+
+# file header: magic, format version, maze dims and the dtype of the cells
+HEADER = struct.Struct('<8sIII8s')
+MAGIC, VERSION, OFFSET = b'DISCOMAP', 1, 64  # the data are 64-byte aligned
+
+
+class DiskMazeMap(MazeMap):
+    """A maze map backed by a read-only layout on disk.
+
+    Details
+    -------
+    The cells of the map are a copy-on-write memory mapping of the file, so
+    that only the pages near the queried cells are read from disk, and many
+    processes opening the same layout share the page cache. The changes,
+    e.g. the placed objects, the consumed targets and the displaced walls,
+    go to private in-memory copies of the touched pages, and never to the
+    file. `.reset` drops the changes by re-mapping the file in O(1) time.
+    """
+    __slots__ = 'path',
+
+    def __init__(self, path, *, generator=None):
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+
+        if len(header) != HEADER.size or header[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'`{path}` is not a maze layout')
+
+        _, version, n_row, n_col, dtype = HEADER.unpack(header)
+        if version != VERSION:
+            raise ValueError(f'Unsupported maze layout version {version}')
+
+        # re-package the random bit generator from the legacy random state
+        if isinstance(generator, np.random.RandomState):
+            generator = generator._bit_generator
+        self.generator_ = np.random.default_rng(generator)
+
+        self.path, self.map = path, None
+        self.reset(dtype=np.dtype(dtype.rstrip(b'\0').decode()),
+                   shape=(1 + 2 * n_row, 1 + 2 * n_col))
+
+    def reset(self, *, dtype=None, shape=None):
+        """Discard the changes to the layout."""
+        if self.map is not None:
+            dtype, shape = self.map.dtype, self.map.shape
+
+        data = np.memmap(self.path, dtype=dtype, mode='c', offset=OFFSET,
+                         shape=shape)
+
+        # a plain array view skips `memmap`'s slow slicing
+        self.map, self._free = data.view(np.ndarray), None
+        self._passable = None
+        return self
+
+    def open_at(self, i, j):
+        """Get the open directions of the cells from their neighbours."""
+        i, j = np.asarray(i), np.asarray(j)
+        n_row, n_col = self.shape
+
+        # the table of the whole map is never built
+        bits = np.zeros(np.broadcast(i, j).shape, dtype=np.uint8)
+        for d in maze.W, maze.S, maze.E, maze.N:
+            _, _, di, dj = maze.ATLAS[d]
+            u, v = i + di, j + dj
+            inside = (0 <= u) & (u < n_row) & (0 <= v) & (v < n_col)
+            cells = self.map[np.clip(u, 0, n_row - 1),
+                             np.clip(v, 0, n_col - 1)]
+            bits[inside & (cells != self.WALL)] |= d
+
+        return bits
+
+    def index_empty(self):
+        # the cells are sampled by rejection, and are never indexed
+        pass
+
+    def sample_empty(self, generator, size=None):
+        """Draw distinct random empty cells by rejection.
+
+        Details
+        -------
+        Takes O(1) expected time per cell, since at least a quarter of the
+        cells of a perfect maze are empty, but reads only the pages of the
+        drawn cells.
+        """
+        # the dict keeps the cells in the random order they were drawn
+        cells = {}
+        while len(cells) < (1 if size is None else size):
+            i, j = generator.integers(self.shape)
+            if self.map[i, j] == self.EMPTY:
+                cells[i, j] = None
+
+        cells = np.array(list(cells), dtype=int).reshape(-1, 2)
+        return cells[0] if size is None else cells
+
+
+def build(path, n_row, n_col, *, generator=None, algorithm='eller'):
+    """Generate a random perfect maze and save its layout to the path.
+
+    Details
+    -------
+    The layout is generated straight into the memory-mapped file, hence,
+    with Eller's algorithm, the maze may be larger than the memory.
+    """
+    # re-package the random bit generator from the legacy random state
+    if isinstance(generator, np.random.RandomState):
+        generator = generator._bit_generator
+    generator = np.random.default_rng(generator)
+
+    # the cells are int8, which leaves room for 126 targets
+    header = HEADER.pack(MAGIC, VERSION, n_row, n_col, b'|i1')
+    with open(path, 'wb') as f:
+        f.write(header.ljust(OFFSET, b'\0'))
+
+    shape = 1 + 2 * n_row, 1 + 2 * n_col
+    data = np.memmap(path, dtype=np.int8, mode='r+', offset=OFFSET,
+                     shape=shape)
+
+    # generate the walls as bools in-place, and negate them in blocks of
+    #  rows to the wall id -1
+    maze.generate(n_row, n_col, generator=generator, algorithm=algorithm,
+                  out=data.view(bool))
+    for j in range(0, len(data), 4096):
+        np.negative(data[j:j + 4096], out=data[j:j + 4096])
+
+    data.flush()
+    del data
+
+    return DiskMazeMap(path)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Build a large random perfect maze on disk.',
+        add_help=True)
+
+    parser.add_argument(
+        'path', type=str,
+        help='the file to save the maze layout to.')
+
+    parser.add_argument(
+        '--n_row', type=int, required=False, default=1000,
+        help='the number of rows in the maze.')
+
+    parser.add_argument(
+        '--n_col', type=int, required=False, default=1000,
+        help='the number of columns in the maze.')
+
+    parser.add_argument(
+        '--algorithm', type=str, required=False, default='eller',
+        choices=maze.ALGORITHMS,
+        help='the maze generator.')
+
+    parser.add_argument(
+        '--seed', type=int, required=False, default=None,
+        help='PRNG seed to use.')
+
+    args = parser.parse_args()
+    print(build(args.path, args.n_row, args.n_col, generator=args.seed,
+                algorithm=args.algorithm))
@@ -1,18 +1,45 @@
 import numpy as np
 
+from functools import lru_cache
+
 from gym import Env
 from gym.spaces import Discrete, Box
 
 from sys import maxsize
 
-from . import maze
+from . import maze, _maze
+from .bank import MazeBank
+from .perf import PerfCounters
+
+
+# the opacity of the unobserved pixels in the rendered frames
+UNOBSERVED_ALPHA = 63
+
+# the lookup table of the unobserved pixels blended against black
+DIMMED = ((np.arange(256) * UNOBSERVED_ALPHA + 127) // 255).astype(np.uint8)
+
+
+@lru_cache(maxsize=None)
+def upscale_index(n, scale):
+    """The read-only index map that repeats each of `n` items `scale` times."""
+    index = np.repeat(np.arange(n), scale)
+    index.flags.writeable = False
+    return index
+
+
+def compact_dtype(n_ids):
+    """Get the narrowest signed integer type for object ids below `n_ids`."""
+    return np.min_scalar_type(-max(n_ids, 2))
 
 
 class BaseMap:
+    __slots__ = 'map', '_free', '_n_free', '_where'
+
     EMPTY = 0  # hardcoded zero id
 
-    def __init__(self, n_row, n_col):
-        self.map = np.full((n_row, n_col), self.EMPTY, dtype=int)
+    def __init__(self, n_row, n_col, *, dtype=int):
+        self.map = np.full((n_row, n_col), self.EMPTY, dtype=dtype)
+        self._free = None
 
     @property
     def shape(self):
@@ -22,18 +49,111 @@ class BaseMap:
     def size(self):
         return self.map.size
 
+    @property
+    def nbytes(self):
+        return self.map.nbytes
+
     def coordinates_of(self, kind=EMPTY):
         return np.stack((self.map == kind).nonzero(), 0).T
 
+    def index_empty(self, flat=None):
+        """Keep the index of the empty cells up to date from now on.
+
+        Details
+        -------
+        The flat indices of the empty cells are kept densely in `_free[:n]`,
+        and `_where` maps a flat index to its position there, or -1. A cell
+        is added by appending, and removed by moving the last one into its
+        place, hence in O(1), but the order of the cells is arbitrary. The
+        order can be restored from `flat`, e.g. of `.empty`.
+        """
+        if flat is None:
+            flat = np.flatnonzero(self.map == self.EMPTY)
+
+        self._free = np.empty(self.map.size, dtype=np.intp)
+        self._free[:len(flat)], self._n_free = flat, len(flat)
+
+        self._where = np.full(self.map.size, -1, dtype=np.intp)
+        self._where[flat] = np.arange(len(flat))
+
+    @property
+    def empty(self):
+        """The flat indices of the empty cells in the order of the index."""
+        if self._free is None:
+            return None
+
+        return self._free[:self._n_free].copy()
+
+    def reindex(self, *cells):
+        """Update the index of the empty cells at the changed `(i, j)`."""
+        if self._free is None:
+            return
+
+        free, where, n_cols = self._free, self._where, self.map.shape[1]
+        for i, j in cells:
+            x = i * n_cols + j
+            if self.map[i, j] == self.EMPTY:
+                if where[x] < 0:
+                    free[self._n_free], where[x] = x, self._n_free
+                    self._n_free += 1
+
+            elif where[x] >= 0:
+                # swap-remove: the last empty cell takes the freed place
+                self._n_free -= 1
+                last = free[self._n_free]
+                free[where[x]], where[last] = last, where[x]
+                where[x] = -1
+
+    def sample_empty(self, generator, size=None):
+        """Draw a random empty cell, or `size` distinct ones.
+
+        Details
+        -------
+        Takes O(size) time with the index of the empty cells, and scans the
+        whole map otherwise.
+        """
+        if self._free is not None:
+            n_cols = self.map.shape[1]
+            if size is None:
+                x = self._free[generator.integers(self._n_free)]
+                return np.array(divmod(x, n_cols))
+
+            index = generator.choice(self._n_free, size=size, replace=False,
+                                     shuffle=False)
+            return np.stack(divmod(self._free[index], n_cols), axis=-1)
+
+        empty = self.coordinates_of(self.EMPTY)
+        if size is None:
+            return generator.choice(empty)
+
+        return generator.choice(empty, size=size, replace=False,
+                                shuffle=False)
+
     def __getitem__(self, index):
         return self.map[index]
 
     def __setitem__(self, index, value):
         assert value != self.EMPTY, 'use `del obj[i, j]` to free space'
         self.map[index] = value
+        self._changed(index)
 
     def __delitem__(self, index):
         self.map[index] = self.EMPTY
+        self._changed(index)
+
+    def _changed(self, index):
+        # the indices are rebuilt on changes other than to a single cell
+        if isinstance(index, tuple) and len(index) == 2 \
+                and all(isinstance(k, (int, np.integer)) for k in index):
+            self.reindex(index)
+
+        else:
+            self.invalidate()
+
+    def invalidate(self):
+        """Rebuild the indices of the map after arbitrary changes."""
+        if self._free is not None:
+            self.index_empty()
 
     def __repr__(self):
         text = 'x'.join(map(str, self.shape))
@@ -43,33 +163,182 @@ class BaseMap:
         return self.map == other
 
     def is_empty(self, i, j):
-        return self[i, j] == self.EMPTY
+        # bypass `__getitem__` on the hot path
+        return self.map[i, j] == self.EMPTY
 
     def relocate(self, p0, p1):
-        if self.is_empty(*p1):
+        map = self.map
+        content = map[p1]
+        if content == self.EMPTY:
             # can relocate to non-obstructed tiles only
-            self[p1] = self[p0]
-            del self[p0]
+            map[p1], map[p0] = map[p0], self.EMPTY
+            self.reindex(p0, p1)
             return self.EMPTY
 
         # return the displaced content
-        return self[p1]
+        return content
 
 
 class MazeMap(BaseMap):
+    __slots__ = 'generator_', '_passable'
+
     WALL = -1
 
-    def __init__(self, n_row, n_col, *, generator=None):
-        super().__init__(1 + 2 * n_row, 1 + 2 * n_col)
+    def __init__(self, n_row, n_col, *, generator=None, walls=None,
+                 dtype=int, algorithm='dfs'):
+        super().__init__(1 + 2 * n_row, 1 + 2 * n_col, dtype=dtype)
+        self._passable = None
 
         # re-package the random bit generator from the legacy random state
         if isinstance(generator, np.random.RandomState):
             generator = generator._bit_generator
         self.generator_ = np.random.default_rng(generator)
 
-        walls = maze.generate(n_row, n_col, generator=self.generator_)
+        # generate a new layout unless a pre-generated one is given
+        if walls is None:
+            walls = maze.generate(n_row, n_col, generator=self.generator_,
+                                  algorithm=algorithm)
+
+        assert walls.shape == self.shape
         self.map[walls] = self.WALL
 
+    @property
+    def passable(self):
+        """The `uint8` table of the open directions of the cells.
+
+        Details
+        -------
+        The bits `maze.W, S, E, N` of a cell are set if its neighbour in that
+        direction is not a wall. The table is built on first access, and is
+        then kept up to date as the walls are displaced.
+        """
+        if self._passable is None:
+            self._passable = _maze.passability(self.map == self.WALL)
+
+        return self._passable
+
+    def open_at(self, i, j):
+        """Get the open directions of the cells at `(i, j)` (or arrays)."""
+        return self.passable[i, j]
+
+    def reindex(self, *cells):
+        super().reindex(*cells)
+        if self._passable is None:
+            return
+
+        # the neighbours of a cell are updated together, hence the first
+        #  one tells if the cell has turned open or closed
+        table, (n_row, n_col) = self._passable, self.shape
+        for i, j in cells:
+            is_open = self.map[i, j] != self.WALL
+            for d in maze.W, maze.S, maze.E, maze.N:
+                _, opposite, di, dj = maze.ATLAS[d]
+                u, v = i + di, j + dj
+                if 0 <= u < n_row and 0 <= v < n_col:
+                    if bool(table[u, v] & opposite) == is_open:
+                        break
+
+                    table[u, v] ^= opposite
+
+    def invalidate(self):
+        super().invalidate()
+        self._passable = None
+
+
+# the `(x, y)` nodes of the piecewise linear rgb channels of matplotlib's
+#  `hot` colormap
+HOT = (
+    ((0.0, 0.0416), (0.365079, 1.0), (1.0, 1.0)),
+    ((0.0, 0.0), (0.365079, 0.0), (0.746032, 1.0), (1.0, 1.0)),
+    ((0.0, 0.0), (0.746032, 0.0), (1.0, 1.0)),
+)
+
+
+def hot(x, *, n=256):
+    """Get the rgb bytes of the `hot` colormap at the values in `[0, 1]`.
+
+    Details
+    -------
+    Reproduces `matplotlib.cm.hot(x, bytes=True)` without the alpha: the
+    channels are tabulated on an `n`-point grid, truncated to bytes, and
+    looked up at the truncated `x * n`.
+    """
+    grid = np.linspace(0, 1, num=n)
+    lut = np.stack([np.interp(grid, *zip(*nodes)) for nodes in HOT], -1)
+    index = np.clip((np.asarray(x) * n).astype(int), 0, n - 1)
+    return (lut * 255).astype(np.uint8)[index]
+
+
+def disco_palette(n_colors):
+    """Get the colours of the empty space, player, targets and walls."""
+    colors = hot(np.linspace(0.2, 0.8, num=n_colors))
+    return [(0, 0, 0), (255, 255, 255), (77, 77, 255),
+            *map(tuple, colors)]
+
+
+def bit_state(generator):
+    """Get the json-friendly state of the generator's bit generator."""
+    def plain(state):
+        # counter-based bit generators keep their keys in arrays
+        if isinstance(state, dict):
+            return {k: plain(v) for k, v in state.items()}
+
+        return state.tolist() if isinstance(state, np.ndarray) else state
+
+    return plain(generator.bit_generator.state)
+
+
+class ColorStream:
+    """A stream of random palette indices drawn from the generator in bulk.
+
+    Details
+    -------
+    Refills a buffer of uint8 indices in `[low, high)` by a single call to
+    the generator, and hands out its consecutive slices, which amortizes
+    the per-step overhead of the generator. The state of the stream is the
+    state of the generator before the last refill and the read position,
+    from which the buffer is redrawn on `.setstate`.
+    """
+    def __init__(self, generator, low, high, *, size=65536):
+        assert 0 <= low < high <= 256 and size > 0
+        self.generator, self.low, self.high = generator, low, high
+
+        # the stream starts empty
+        self.buffer, self.state = np.empty(size, dtype=np.uint8), None
+        self.pos = size
+
+    def refill(self, size):
+        self.state = bit_state(self.generator)
+        self.buffer = self.generator.integers(self.low, self.high, size=size,
+                                              dtype=np.uint8)
+        self.pos = 0
+
+    def take(self, n):
+        """Get a read-only slice of the next `n` indices."""
+        n = int(n)
+        if self.pos + n > len(self.buffer):
+            self.refill(max(n, len(self.buffer)))
+
+        out = self.buffer[self.pos:self.pos + n]
+        out.flags.writeable = False
+        self.pos += n
+        return out
+
+    def getstate(self):
+        return dict(state=self.state, pos=self.pos, size=len(self.buffer))
+
+    def setstate(self, state):
+        self.state, self.pos = state['state'], state['pos']
+        if self.state is None:
+            self.buffer = np.empty(state['size'], np.uint8)
+            return
+
+        # redraw the buffer from a copy of the generator before the refill
+        bit_generator = type(self.generator.bit_generator)()
+        bit_generator.state = self.state
+        self.buffer = np.random.Generator(bit_generator).integers(
+            self.low, self.high, size=state['size'], dtype=np.uint8)
+
 
 class RandomDiscoMaze(Env):
     """Random Disco Maze
@@ -83,103 +352,434 @@ class RandomDiscoMaze(Env):
 
     PLAYER = 1  # hardcoded id of the player
 
+    # the number of agents, which have the ids following the player's
+    n_agents = 1
+
+    # rgb pixels, channel-first rgb, palette indices, or packed one-hot
+    #  planes of the palette indices
+    obs_formats = 'rgb', 'chw', 'index', 'planes'
+
     metadata = {
-        'render.modes': {'human', 'state_pixels'},
+        'render.modes': {'human', 'state_pixels', 'rgb_array'},
+    }
+
+    # the profiled phases and the methods that implement them
+    perf_phases = {
+        'reset': 'reset', 'generate': 'generate', 'spawn': 'spawn',
+        'step': 'step', 'move': '_move', 'update': 'update',
+        'window': 'window', 'observation': 'observation',
+        'render': 'render',
     }
 
     def __init__(self, n_row=10, n_col=10, *, n_colors=5, n_targets=1,
-                 field=None, generator=None):
+                 field=None, generator=None, maze_bank=None,
+                 reuse_buffers=False, lazy_render=False, profile=False,
+                 color_stream=False, walls_only=False, obs_format='rgb',
+                 frame_stack=None, maze_file=None, respawn_targets=False,
+                 episode_seed=None):
         # super().__init__()
         assert field is None or isinstance(field, tuple)
         self.field = field
 
+        # sample layouts from a bank of pre-generated mazes, if provided
+        if maze_bank is not None and not isinstance(maze_bank, MazeBank):
+            maze_bank = MazeBank(maze_bank)
+        assert maze_bank is None or maze_bank.shape == (1 + 2 * n_row,
+                                                        1 + 2 * n_col)
+        self.maze_bank = maze_bank
+
         # re-package the random bit generator from the legacy random state
         if isinstance(generator, np.random.RandomState):
             generator = generator._bit_generator
         self.generator_ = np.random.default_rng(generator)
 
-        from matplotlib.cm import hot
-        colors = hot(np.linspace(0.2, 0.8, num=n_colors), bytes=True)
-        self.COLORS = [(0, 0, 0), (255, 255, 255), (77, 77, 255),
-                       *map(tuple, colors[:, :-1])]  # remove alpha
+        # draw every episode from its own stream keyed by the seed and the
+        #  episode's index, see `.start_episode`
+        assert episode_seed is None or 0 <= episode_seed < 2**64
+        self.episode_seed, self.episode = episode_seed, None
+
+        # play on the single large layout on disk, if provided, which is
+        #  reset, rather than regenerated, by `.reset`
+        if maze_file is not None:
+            from .disk import DiskMazeMap
+            if not isinstance(maze_file, DiskMazeMap):
+                maze_file = DiskMazeMap(maze_file, generator=self.generator_)
+
+            assert maze_file.shape == (1 + 2 * n_row, 1 + 2 * n_col)
+            assert compact_dtype(1 + self.n_agents + n_targets).itemsize \
+                <= maze_file.map.dtype.itemsize
+        self.maze_file = maze_file
+
+        self.COLORS = disco_palette(n_colors)
+
+        # the palette lookup table maps a colour index to its rgb pixel
+        self.palette = np.array(self.COLORS, dtype=np.uint8)
+
+        # the cells are painted with their rgb colours, or, in the compact
+        #  formats, with their palette indices by the identity lookup table
+        assert obs_format in self.obs_formats
+        self.obs_format, self._pixels = obs_format, self.palette
+        if obs_format in ('index', 'planes'):
+            assert len(self.palette) <= 256
+            self._pixels = np.arange(len(self.palette), dtype=np.uint8)
+            self._pixels = self._pixels[:, np.newaxis]
+
+        # the bit `k` of the `b`-th plane is set for the colour `8 b + k`
+        self._planes = np.packbits(np.eye(len(self.palette), dtype=bool),
+                                   axis=1, bitorder='little').T
+
+        # draw the random colours from a bulk stream (of the given size),
+        #  and only for the walls, rather than for every cell
+        self.color_stream, self.walls_only = color_stream, walls_only
+        self._colors = self.make_color_stream()
 
         self.n_row, self.n_col, self.n_targets = n_row, n_col, n_targets
 
+        # put the consumed targets back at random empty cells, hence the
+        #  episodes end only when the player hits a wall
+        self.respawn_targets = respawn_targets
+
+        # preallocate buffers for the state and observations, which are
+        #  overwritten in-place on every step (the caller must copy them)
+        self.reuse_buffers = reuse_buffers
+        self._state_buffer = self._field_buffer = self._mask_buffer = None
+        self._frame_buffers, self._obs_buffer = {}, None
+        self._layer_buffer = self._where_buffer = self._lut = None
+        if self.reuse_buffers:
+            n_channels = self._pixels.shape[1]
+            shape = 1 + 2 * n_row, 1 + 2 * n_col
+            self._state_buffer = np.empty((*shape, n_channels), dtype=np.uint8)
+            self._mask_buffer = np.empty((*shape, 1), dtype=bool)
+
+            # the class layer and the cells lit by the random colours
+            self._layer_buffer = np.empty(shape, dtype=np.uint8)
+            self._where_buffer = np.empty(shape, dtype=bool)
+            if self.field is not None:
+                shape = 1 + 2 * self.field[0], 1 + 2 * self.field[1]
+                self._field_buffer = np.empty((*shape, n_channels),
+                                              dtype=np.uint8)
+
+            # the compact formats other than `index` are not views
+            if obs_format in ('chw', 'planes'):
+                self._obs_buffer = np.empty(self.formatted_shape(shape),
+                                            dtype=np.uint8)
+
+        # paint only the observed windows, and the full state on demand,
+        #  with the colours hashed from the key of the step, see `.repaint`
+        self.lazy_render, self._paint_key = lazy_render, None
+
+        # stack the last `frame_stack` observations, see `.stacked`
+        assert frame_stack is None or frame_stack > 0
+        self.frame_stack, self._stack, self._stack_pos = frame_stack, None, 0
+        if self.frame_stack is not None:
+            shape = 1 + 2 * n_row, 1 + 2 * n_col
+            if self.field is not None:
+                shape = 1 + 2 * self.field[0], 1 + 2 * self.field[1]
+
+            shape = self.formatted_shape(shape)
+            self._stack = np.empty((2 * frame_stack, *shape), dtype=np.uint8)
+
+        # time the phases, and report the stats in `info` if 'info'
+        assert profile in (False, True, 'info')
+        self._perf = None
+        if profile:
+            self._perf = PerfCounters()
+            self._perf.instrument(self, self.perf_phases)
+            if profile == 'info':
+                self._perf.attach(self)
+
         # cache the pixels so that consecutive calls to `.render` with
         #  `mode` other than `state_pixels` yield the same result.
-        self.state = None
+        self.state, self._windows = None, {}
         self.reset()
 
+        # the first call to `.reset` (re)starts from the episode 0
+        if self.episode_seed is not None:
+            self.episode = None
+
         # actions are the cardinal directions
         self.action_space = Discrete(len(self.directions))
         self.named_actions = dict(zip(maze.DIR_LABELS,
                                       range(len(self.directions))))
 
+        # the open direction bits required by the actions
+        self._action_bits = np.array(self.directions, dtype=np.uint8)
+
         # the observation space is state `pixels'
         shape = self.maze.shape
         if self.field is not None:
             # the field of view is centered around the player
             shape = 1 + 2 * self.field[0], 1 + 2 * self.field[1]
-        self.observation_space = Box(
-            low=0, high=255, dtype=np.uint8, shape=(*shape, 3))
 
-    def observation(self, *, by=PLAYER):
-        """Get the pixels observed from the object's vantage point."""
+        shape = self.formatted_shape(shape)
+        if self.frame_stack is not None:
+            shape = self.frame_stack, *shape
+
+        high = len(self.palette) - 1 if obs_format == 'index' else 255
+        self.observation_space = Box(low=0, high=high, dtype=np.uint8,
+                                     shape=shape)
+
+    def formatted_shape(self, shape):
+        """Get the shape of the `(H, W)` pixels in the observation format."""
+        if self.obs_format == 'rgb':
+            return (*shape, 3)
+
+        elif self.obs_format == 'chw':
+            return (3, *shape)
+
+        elif self.obs_format == 'planes':
+            return (len(self._planes), *shape)
+
+        return shape
+
+    def formatted(self, pixels, *, out=None):
+        """Convert the env's `(..., H, W, C)` pixels into the obs format.
+
+        Details
+        -------
+        The rgb and index pixels are returned as they are, or as views, unless
+        `out` is given, and the packed planes are looked up directly by the
+        palette indices.
+        """
+        if self.obs_format == 'chw':
+            pixels = np.moveaxis(pixels, -1, -3)
+
+        elif self.obs_format == 'index':
+            pixels = pixels[..., 0]
+
+        elif self.obs_format == 'planes':
+            # look up the `(B, P)` planes' table by the indices
+            if pixels.ndim == 3:
+                return np.take(self._planes, pixels[..., 0], axis=1, out=out)
+
+            planes = np.take(self._planes, pixels[..., 0], axis=1)
+            pixels = np.moveaxis(planes, 0, -3)
+
+        if out is None:
+            # the channel-first rgb is made contiguous
+            return np.ascontiguousarray(pixels)
+
+        np.copyto(out, pixels)
+        return out
+
+    def rgb(self, pixels):
+        """Get the rgb colours of the env's pixels."""
+        if self._pixels is self.palette:
+            return pixels
+
+        return np.take(self.palette, pixels[..., 0], axis=0)
+
+    def is_player(self, obs):
+        """Get the `(..., H, W)` mask of the player in formatted pixels."""
+        obs = np.asarray(obs)
+        if self.obs_format == 'rgb':
+            return np.all(obs == self.palette[self.PLAYER], axis=-1)
+
+        elif self.obs_format == 'chw':
+            player = self.palette[self.PLAYER, :, np.newaxis, np.newaxis]
+            return np.all(obs == player, axis=-3)
+
+        elif self.obs_format == 'planes':
+            return (obs[..., 0, :, :] & (1 << self.PLAYER)) != 0
+
+        return obs == self.PLAYER
+
+    @property
+    def state(self):
+        """The pixels of the full state at the current step."""
+        if self._state is None and self.lazy_render:
+            # the hashed colours agree with the already observed windows
+            self._state = self.update(out=self._state_buffer)
+
+        return self._state
+
+    @state.setter
+    def state(self, value):
+        # new pixels invalidate the frames rendered from the old ones
+        self._state, self._frames = value, {}
+
+    def window(self, i0, i1, j0, j1):
+        """Get the pixels of a rectangular region of the state."""
+        if self._state is not None or not self.lazy_render:
+            return self.state[i0:i1, j0:j1]
+
+        # paint only the region unless it has been painted at this step
+        rect = i0, i1, j0, j1
+        if rect not in self._windows:
+            self._windows[rect] = self.update(window=np.s_[i0:i1, j0:j1])
+
+        return self._windows[rect]
+
+    def observation(self, *, by=PLAYER, out=None):
+        """Get the observation from the object's vantage point."""
+        if self.obs_format == 'rgb':
+            return self.observed(by=by, out=out)
+
+        if out is None:
+            out = self._obs_buffer
+
+        return self.formatted(self.observed(by=by), out=out)
+
+    def observed(self, *, by=PLAYER, out=None):
+        """Get the pixels observed from the object's vantage point.
+
+        Details
+        -------
+        If `out` is given, then the pixels are written into it, and only its
+        regions outside of the full state are re-painted with empty space.
+        """
         if self.field is None:
-            return self.state
+            if out is None:
+                return self.state
+
+            np.copyto(out, self.state)
+            return out
 
         i, j = self.objects[by]
         # intersect `field` centered at (i, j) with the full state
         n_field_rows, n_field_cols = self.field
-        field = np.full((1 + 2 * n_field_rows, 1 + 2 * n_field_cols, 3),
-                        self.COLORS[0], dtype=self.state.dtype)
+        if out is None:
+            out = self._field_buffer
+        if out is None:
+            out = np.empty((1 + 2 * n_field_rows, 1 + 2 * n_field_cols,
+                            self._pixels.shape[1]), dtype=np.uint8)
 
         # compute the intersection of two rectangles
-        n_row, n_col, _ = self.state.shape
+        n_row, n_col = self.maze.shape
         i0, i1 = max(i - n_field_rows, 0), min(i + n_field_rows + 1, n_row)
         j0, j1 = max(j - n_field_cols, 0), min(j + n_field_cols + 1, n_col)
 
+        # the intersection in the field's coordinates
+        u0, u1 = i0 - (i - n_field_rows), i1 - (i - n_field_rows)
+        v0, v1 = j0 - (j - n_field_cols), j1 - (j - n_field_cols)
+
+        # paint the padding around the intersection with empty space
+        empty = self._pixels[0]
+        out[:u0], out[u1:] = empty, empty
+        out[u0:u1, :v0], out[u0:u1, v1:] = empty, empty
+
         # copy state's slice into the field's
         np.copyto(
-            field[i0 - (i - n_field_rows):i1 - (i - n_field_rows),
-                  j0 - (j - n_field_cols):j1 - (j - n_field_cols)],
-            self.state[i0:max(i1, 0), j0:max(j1, 0)]  # do not wrap-around
+            out[u0:u1, v0:v1],
+            self.window(i0, max(i1, 0), j0, max(j1, 0))  # no wrap-around
         )
 
-        return field
-
-    def observation_mask(self, *, by=PLAYER):
+        return out
+
+    def stacked(self, *, reset=False):
+        """Push the player's observation onto the stack of the recent ones.
+
+        Details
+        -------
+        The `k` stacked frames live in a ring of `2 k` frames, each written
+        twice, at `t mod k` and `t mod k + k`, so that the last `k` frames
+        are always a contiguous slice of the ring. The stack is a read-only
+        view of shape `(k, ...)`, oldest first, which is overwritten by the
+        subsequent steps (the caller must copy it). On reset, or after
+        restoring a snapshot without the stack, the stack is filled with the
+        first observation.
+        """
+        if self.frame_stack is None:
+            return self.observation()
+
+        k = self.frame_stack
+        if reset or self._stack_pos is None:
+            self._stack_pos = k - 1
+            self.observation(out=self._stack[0])
+            self._stack[1:] = self._stack[0]
+
+        else:
+            self._stack_pos = pos = (self._stack_pos + 1) % k
+            self.observation(out=self._stack[pos + k])
+            self._stack[pos] = self._stack[pos + k]
+
+        view = self._stack[self._stack_pos + 1:self._stack_pos + 1 + k]
+        view.flags.writeable = False
+        return view
+
+    def observation_mask(self, *, by=PLAYER, out=None):
         """Get a binary mask of the observed pixels by the specified object."""
+        if out is None:
+            out = self._mask_buffer
+        if out is None:
+            out = np.empty((*self.maze.shape, 1), dtype=bool)
+
         if self.field is None:
-            return np.ones_like(self.state[..., :1], dtype=bool)
+            out.fill(True)
+            return out
 
         i, j = self.objects[by]
         r, c = self.field
 
         # clip potentially negative indices to zero
-        mask = np.zeros_like(self.state[..., :1], dtype=bool)
-        mask[max(i-r, 0):i+r+1, max(j-c, 0):j+c+1] = True
-        return mask
+        out.fill(False)
+        out[max(i-r, 0):i+r+1, max(j-c, 0):j+c+1] = True
+        return out
+
+    def action_mask(self, *, by=PLAYER):
+        """Get the mask of the safe actions of the object.
+
+        Details
+        -------
+        The safe actions do not hit a wall: staying in place, and moving to
+        empty space, a target or another object. See `.safe_actions`.
+        """
+        return self.safe_actions(*self.objects[by])
+
+    def safe_actions(self, i, j):
+        """Get the `(..., n_actions)` masks of the safe actions at `(i, j)`.
+
+        Details
+        -------
+        The coordinates may be arrays, e.g. of the positions of many agents,
+        and the masks are looked up in the map's table of open directions.
+        """
+        bits = np.asarray(self.maze.open_at(i, j))[..., np.newaxis]
+        return (bits & self._action_bits != 0) | (self._action_bits == 0)
 
     def spawn(self, n=1):
         # generate positions
-        positions = self.generator_.choice(
-            self.maze.coordinates_of(MazeMap.EMPTY),
-            size=n, replace=False, shuffle=False
-        )
+        positions = self.maze.sample_empty(self.generator_, size=n)
 
         for i, j in positions:
             self.maze[i, j] = len(self.objects)
             self.objects.append((i, j))
             self.targets.add(self.maze[i, j])
 
+        # flag the live targets' ids for the compiled step kernel
+        self._is_target = np.zeros(len(self.objects), dtype=np.uint8)
+        self._is_target[list(self.targets)] = True
+
         return positions
 
-    def reset(self):
-        self.maze = MazeMap(self.n_row, self.n_col, generator=self.generator_)
+    def respawn(self, oid):
+        """Put the consumed target back at a random empty cell."""
+        i, j = self.maze.sample_empty(self.generator_)
+        self.maze[i, j] = oid
+        self.objects[oid] = i, j
+        self.targets.add(oid)
+        self._is_target[oid] = True
+
+    def generate(self):
+        """Create a new maze map, with the layout drawn from the bank."""
+        if self.maze_file is not None:
+            return self.maze_file.reset()
+
+        walls = None
+        if self.maze_bank is not None:
+            walls = self.maze_bank.sample(self.generator_)
+
+        # the map holds only the empty space, walls, player and targets
+        n_ids = 1 + self.n_agents + self.n_targets
+        return MazeMap(self.n_row, self.n_col, walls=walls,
+                       generator=self.generator_, dtype=compact_dtype(n_ids))
+
+    def reset(self, *, episode=None):
+        self.start_episode(episode)
+        self.maze = self.generate()
 
         # create the player : `None` represents the empty space
-        i, j = self.generator_.choice(self.maze.coordinates_of(MazeMap.EMPTY))
+        i, j = self.maze.sample_empty(self.generator_)
         self.maze[i, j] = self.PLAYER
         self.objects = [None, (i, j)]
         self.is_alive = True
@@ -188,79 +788,261 @@ class RandomDiscoMaze(Env):
         self.targets = set()
         self.spawn(self.n_targets)
 
-        self.state = self.update()
-        return self.observation()
-
-    def update(self, *, maze=None):
+        # index the empty cells for the cheap respawns
+        if self.respawn_targets:
+            self.maze.index_empty()
+
+        self.repaint()
+        return self.stacked(reset=True)
+
+    def start_episode(self, episode=None):
+        """Switch to the random stream of the episode, by default the next.
+
+        Details
+        -------
+        With `episode_seed`, the episode `k` draws all its randomness from
+        the counter-based Philox generator keyed by `(episode_seed, k)`,
+        hence any episode is reproduced in O(1) time regardless of the ones
+        before it, e.g. the workers generating the shards `k = w, w + W, ...`
+        of a dataset make the same episodes as a single serial env. Without
+        `episode_seed`, the episodes continue the stream of `generator`.
+        """
+        if self.episode_seed is None:
+            assert episode is None, '`episode` requires an `episode_seed`'
+            return
+
+        if episode is None:
+            episode = 0 if self.episode is None else self.episode + 1
+        assert 0 <= episode < 2**64
+
+        key = self.episode_seed | (episode << 64)
+        self.generator_ = np.random.Generator(np.random.Philox(key=key))
+        self._colors = self.make_color_stream()
+        self.episode = episode
+
+    def classes(self, *, maze=None, window=np.s_[:, :], out=None):
+        """Get the class layer of the map's cells.
+
+        Details
+        -------
+        Empty space, the player (and the other agents) and the targets have
+        classes 0, 1 and 2, respectively, and everything else, e.g. the walls,
+        has class 3.
+        """
         maze = maze or self.maze
         assert isinstance(maze, BaseMap)
 
-        # pick random colors and paint walls with them
-        colors = self.generator_.choice(self.COLORS[3:], size=maze.size)
-        pix = np.array(colors).reshape(*maze.shape, 3)
+        # the lookup table of classes by the object ids, with the id of the
+        #  walls (-1) picking the last entry, is rebuilt in-place
+        if self._lut is None or len(self._lut) != len(self.objects) + 1:
+            self._lut = np.empty(len(self.objects) + 1, dtype=np.uint8)
+
+        lut = self._lut
+        lut.fill(3)
+        np.copyto(lut[:len(self._is_target)], 2,
+                  where=self._is_target.view(bool))
+        lut[MazeMap.EMPTY] = 0
+        lut[self.PLAYER:self.PLAYER + self.n_agents] = 1
+
+        map = maze.map[window]
+        if out is None:
+            out = np.empty(map.shape, dtype=np.uint8)
+
+        # the compiled lookup takes the narrow ids without casting to intp
+        _maze.lookup(lut[:, np.newaxis], map, out[..., np.newaxis])
+        return out
+
+    def palette_index(self, *, maze=None, window=np.s_[:, :]):
+        """Get the palette indices of the map's cells with randomly lit walls.
+
+        Details
+        -------
+        The cells of classes 0-2 (see `.classes`) have the palette indices
+        equal to their class, and everything else is painted with a random
+        colour from the disco part of the palette, i.e. `COLORS[3:]`.
+
+        With `reuse_buffers`, the indices of the full map are written into
+        a buffer, which is overwritten by the next call, and, with either
+        `color_stream` or `walls_only`, nothing is allocated.
+        """
+        map = (maze or self.maze).map
+        if self.lazy_render:
+            # the lit cells take their hashed colours, see `.hashed_colors`
+            layer = self.classes(maze=maze, window=window)
+            colors = self.hashed_colors(map.shape, window)
+            np.copyto(layer, colors, where=layer == 3)
+            return layer
+
+        shape = map[window].shape
+        layer, where = None, None
+        if self.reuse_buffers and shape == self._layer_buffer.shape:
+            layer, where = self._layer_buffer, self._where_buffer
+
+        layer = self.classes(maze=maze, window=window, out=layer)
+        if where is None:
+            where = np.empty(shape, dtype=bool)
+
+        if self.walls_only:
+            # only the walls are lit, so draw the colours only for them
+            is_wall = np.equal(layer, 3, out=where)
+            layer[is_wall] = self.random_colors(np.count_nonzero(is_wall))
+            return layer
+
+        if self._colors is not None:
+            index = self.random_colors(layer.size).reshape(shape)
+            np.copyto(layer, index, where=np.equal(layer, 3, out=where))
+            return layer
+
+        # draw random colour indices for all cells in bulk (consumes exactly
+        #  the same random bits as `.choice(self.COLORS[3:], size=...)`)
+        index = self.generator_.integers(3, len(self.palette), size=shape)
+
+        # overlay the class layer of empty space, the player and the targets
+        np.copyto(index, layer, where=np.less(layer, 3, out=where))
+        return index
+
+    def hashed_colors(self, shape, window=np.s_[:, :]):
+        """Get the colour indices of the cells hashed from the step's key.
+
+        Details
+        -------
+        The colour of a cell is the splitmix64 hash of its flat index in the
+        map of the given shape, mixed with the key of the step, which is
+        drawn once per `.repaint`. The colours thus do not depend on which
+        windows are painted, or in what order, and the painting never
+        advances the generator of the game.
+        """
+        rows = np.arange(shape[0], dtype=np.uint64)[window[0]]
+        cols = np.arange(shape[1], dtype=np.uint64)[window[1]]
+        z = rows[:, np.newaxis] * np.uint64(shape[1]) + cols
+        z = z * np.uint64(0x9E3779B97F4A7C15) + np.uint64(self._paint_key)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z ^= z >> np.uint64(31)
+
+        # scale the top 32 bits to the disco part of the palette
+        n_colors = np.uint64(len(self.palette) - 3)
+        z = ((z >> np.uint64(32)) * n_colors) >> np.uint64(32)
+        return (z + np.uint64(3)).astype(np.uint8)
+
+    def make_color_stream(self):
+        if not self.color_stream:
+            return None
 
-        # assign proper colors to empty space, the player and the targets
-        n_row, n_col = maze.shape
-        for i in range(n_row):
-            for j in range(n_col):
-                if maze[i, j] == MazeMap.EMPTY:
-                    pix[i, j] = self.COLORS[0]
+        size = 65536 if self.color_stream is True else self.color_stream
+        return ColorStream(self.generator_, 3, len(self.palette), size=size)
 
-                elif maze[i, j] == self.PLAYER:
-                    pix[i, j] = self.COLORS[1]
+    def random_colors(self, n):
+        """Get `n` random colour indices from the disco part of the palette."""
+        if self._colors is not None:
+            return self._colors.take(n)
 
-                elif maze[i, j] in self.targets:
-                    pix[i, j] = self.COLORS[2]
+        return self.generator_.integers(3, len(self.palette), size=n,
+                                        dtype=np.uint8)
 
-        return pix
+    def update(self, *, maze=None, window=np.s_[:, :], out=None):
+        # paint the cells by looking up their colour index in the palette
+        index = self.palette_index(maze=maze, window=window)
+        if out is None:
+            out = np.empty((*index.shape, self._pixels.shape[1]),
+                           dtype=np.uint8)
 
-    def _move(self, oid, dir):
-        i, j = self.objects[oid]
+        return _maze.lookup(self._pixels, index, out)
 
-        _, _, u, v = maze.ATLAS[dir]
-        if u == 0 and v == 0:
-            # displacing self is always successful
-            return MazeMap.EMPTY
+    def repaint(self):
+        """Invalidate the pixels of the previous step and paint new ones."""
+        self.state, self._windows = None, {}
+        if not self.lazy_render:
+            self.state = self.update(out=self._state_buffer)
 
-        u, v = u + i, v + j
+        else:
+            # the key of the step's colours is the only draw of the painting
+            self._paint_key = int(self.generator_.integers(
+                2**64, dtype=np.uint64))
 
-        dest_id = self.maze[u, v]
-        if dest_id in self.targets:
-            del self.maze[u, v]  # consume the target
-
-        if dest_id == MazeMap.WALL:
-            del self.maze[u, v]  # displace the wall
+    def _move(self, oid, dir):
+        i, j = self.objects[oid]
 
-        if self.maze.relocate((i, j), (u, v)) == MazeMap.EMPTY:
-            self.objects[oid] = u, v  # update the position
+        # consume the target or displace the wall, and then relocate
+        _, _, u, v = maze.ATLAS[dir]
+        dest_id, u, v, reward, is_dead = _maze.move_object(
+            self.maze.map, i, j, u, v, self._is_target)
+        if u != i or v != j:
+            self.maze.reindex((i, j), (u, v))
 
-        return dest_id
+        self.objects[oid] = u, v  # update the position
+        return dest_id, reward, is_dead
 
     def step(self, action):
-        dest_id = MazeMap.EMPTY
+        dest_id, reward, is_dead = MazeMap.EMPTY, 0., False
         if action is not None and self.is_alive:
-            dest_id = self._move(self.PLAYER, self.directions[action])
+            dest_id, reward, is_dead = self._move(self.PLAYER,
+                                                  self.directions[action])
 
         # check winning conditions
-        reward = 0.
-        if dest_id in self.targets:
+        if reward:
             self.targets.remove(dest_id)
             self.objects[dest_id] = None
-            reward = 1.
+            self._is_target[dest_id] = False
+            if self.respawn_targets:
+                self.respawn(dest_id)
 
         # check termination conditions: maze hazards, or no targets left
-        self.is_alive = (dest_id != MazeMap.WALL) and self.is_alive
+        self.is_alive = not is_dead and self.is_alive
         any_targets = bool(self.targets) or (self.n_targets == 0)
 
         is_terminal = not any_targets or not self.is_alive
 
-        self.state = self.update()
-        return self.observation(), reward, is_terminal, {}
+        self.repaint()
+        return self.stacked(), reward, is_terminal, {}
 
-    def render(self, mode='state_pixels'):
+    def frame(self, *, scale=1):
+        """Get the frame of the full state upscaled by an integer factor.
+
+        Details
+        -------
+        The unobserved pixels are dimmed as if blended against black with
+        the alpha of the 'human' mode. The frames are cached until the next
+        step, and with `reuse_buffers` they are overwritten in-place.
+        """
+        assert isinstance(scale, int) and scale > 0
+        if scale in self._frames:
+            return self._frames[scale]
+
+        state = pixels = self.rgb(self.state)
+        if self.field is not None:
+            # dim everything, and then restore the observed field
+            pixels = np.take(DIMMED, state)
+
+            i, j = self.objects[self.PLAYER]
+            r, c = self.field
+            observed = np.s_[max(i-r, 0):i+r+1, max(j-c, 0):j+c+1]
+            pixels[observed] = state[observed]
+
+        n_row, n_col, n_channels = pixels.shape
+        shape = n_row * scale, n_col * scale, n_channels
+        out = self._frame_buffers.get(scale) if self.reuse_buffers else None
+        if out is None:
+            out = np.empty(shape, dtype=np.uint8)
+            if self.reuse_buffers:
+                self._frame_buffers[scale] = out
+
+        # widen the rows by the cached index map, and then repeat each of
+        #  them by broadcasting, which copies contiguous rows in bulk
+        rows = np.take(pixels, upscale_index(n_col, scale), axis=1)
+        np.copyto(out.reshape(n_row, scale, *shape[1:]),
+                  rows[:, np.newaxis])
+
+        self._frames[scale] = out
+        return out
+
+    def render(self, mode='state_pixels', *, scale=5):
         assert mode in self.metadata['render.modes']
         if mode == 'state_pixels':
-            return self.state  # return full/observed state
+            return self.rgb(self.state)  # return full/observed state
+
+        if mode == 'rgb_array':
+            return self.frame(scale=scale)
 
         # other rendering
         if not hasattr(self, '_viewer'):
@@ -268,15 +1050,105 @@ class RandomDiscoMaze(Env):
             self._viewer = SimpleImageViewer(scale=(5, 5), vsync=True)
 
         # append the observability mask as alpha w. value 0.25
-        mask = np.where(self.observation_mask(), np.uint8(255), np.uint8(63))
-        masked_state = np.concatenate([self.state, mask], axis=-1)
+        if not hasattr(self, '_render_buffer'):
+            self._render_buffer = np.empty((*self.maze.shape, 4),
+                                           dtype=np.uint8)
+
+        masked_state = self._render_buffer
+        masked_state[..., :3] = self.rgb(self.state)
+        masked_state[..., 3:] = UNOBSERVED_ALPHA
+        np.copyto(masked_state[..., 3:], 255,
+                  where=self.observation_mask(out=self._mask_buffer))
         return self._viewer.imshow(masked_state)
 
+    def snapshot(self):
+        """Get the state of the env and its random generator.
+
+        Details
+        -------
+        The snapshot has no pixels, except for the stacked frames with
+        `frame_stack`: restoring it and stepping the env with the same
+        actions reproduces the original trajectory exactly.
+        """
+        snapshot = dict(
+            generator=bit_state(self.generator_),
+            episode_seed=self.episode_seed,
+            episode=self.episode,
+            map=self.maze.map.copy(),
+            objects=[p if p is None else (int(p[0]), int(p[1]))
+                     for p in self.objects],
+            targets=sorted(map(int, self.targets)),
+            is_alive=self.is_alive,
+            colors=self._colors and self._colors.getstate(),
+            empty=self.maze.empty,
+            paint_key=self._paint_key,
+        )
+
+        if self.frame_stack is not None and self._stack_pos is not None:
+            k, pos = self.frame_stack, self._stack_pos
+            snapshot['stack'] = self._stack[pos + 1:pos + 1 + k].copy()
+
+        return snapshot
+
+    def restore(self, snapshot):
+        """Restore the env from a snapshot and invalidate the pixels."""
+        # the bit generator must be of the same kind as the snapshot's
+        self.generator_.bit_generator.state = snapshot['generator']
+
+        walls = np.zeros(snapshot['map'].shape, dtype=bool)
+        self.maze = MazeMap(self.n_row, self.n_col, walls=walls,
+                            generator=self.generator_,
+                            dtype=snapshot['map'].dtype)
+        self.maze.map[:] = snapshot['map']
+
+        self.objects = list(snapshot['objects'])
+        self.targets = set(snapshot['targets'])
+        self.is_alive = snapshot['is_alive']
+        self._paint_key = snapshot.get('paint_key')
+        self.episode_seed = snapshot.get('episode_seed', self.episode_seed)
+        self.episode = snapshot.get('episode', self.episode)
+        if snapshot.get('colors') is not None:
+            self._colors.setstate(snapshot['colors'])
+
+        self._is_target = np.zeros(len(self.objects), dtype=np.uint8)
+        self._is_target[list(self.targets)] = True
+        if self.respawn_targets:
+            self.maze.index_empty(snapshot.get('empty'))
+
+        # refill the ring with the stacked frames, or, if the snapshot has
+        #  none, with the next observation, see `.stacked`
+        if self.frame_stack is not None:
+            k, stack = self.frame_stack, snapshot.get('stack')
+            self._stack_pos = None
+            if stack is not None:
+                self._stack_pos = k - 1
+                self._stack[:k] = self._stack[k:] = stack
+
+        self.state, self._windows = None, {}
+
+    def perf_stats(self, *, clear=False):
+        """Get the profiled calls and times of the phases (if `profile`)."""
+        if self._perf is None:
+            return {}
+
+        stats = self._perf.stats()
+        if clear:
+            self._perf.clear()
+
+        return stats
+
     def seed(self, seed=None):
         # create an instance of the default prgn and draw a seed from it
         if seed is None:
             seed = np.random.default_rng().integers(maxsize)
         self.generator_ = np.random.default_rng(seed)
+
+        # the colour stream draws from the new generator
+        self._colors = self.make_color_stream()
+
+        # ... or the episodes are keyed by the new seed from the first one
+        if self.episode_seed is not None:
+            self.episode_seed, self.episode = seed % 2**64, None
         return [seed]
 
     @property
@@ -1,3 +1,4 @@
 from .goal import RandomDiscoGoal
 from .explore import ExploreRandomDiscoMaze
 from .position import RandomDiscoMazeWithPosition
+from .multi import MultiAgentDiscoMaze
@@ -2,6 +2,7 @@ import numpy
 
 from queue import deque
 from ..env import RandomDiscoMaze
+from ..maze import TreeDistance
 
 
 def bfs(map, x, y):
@@ -27,28 +28,36 @@ def bfs(map, x, y):
 
 class ExploreRandomDiscoMaze(RandomDiscoMaze):
     """DiscoMaze with goal-oriented reward shaping."""
-    def __init__(self, n_row=10, n_col=10, *, n_colors=5,
-                 field=None, generator=None, alpha=10.):
+    perf_phases = {**RandomDiscoMaze.perf_phases, 'shaping': 'shaping'}
+
+    def __init__(self, n_row=10, n_col=10, *, alpha=10., **kwargs):
+        # the other options are those of `RandomDiscoMaze`, without targets
         self.alpha = alpha
-        super().__init__(n_row, n_col, field=field, generator=generator,
-                         n_colors=n_colors, n_targets=0)
+        super().__init__(n_row, n_col, n_targets=0, **kwargs)
 
     @property
     def player(self):
         return self.objects[self.PLAYER]
 
-    def reset(self):
-        obs = super().reset()
+    def reset(self, *, episode=None):
+        obs = super().reset(episode=episode)
 
         # generate the unobserved goal coordinates
-        empty = self.maze.coordinates_of(self.maze.EMPTY)
-        self.goal = tuple(self.generator_.choice(empty))
+        self.goal = tuple(self.maze.sample_empty(self.generator_))
 
-        # precimpute the reward based on shortes path to the goal
-        rewards = 1 - bfs(self.maze.map, *self.goal)
-        self.proximity_reward = numpy.power(rewards, self.alpha)
+        self.proximity_reward = self.shaping()
         return obs
 
+    def shaping(self):
+        """Compute the rewards based on the shortest path to the goal."""
+        # the distance oracle of the perfect maze's tree of free cells
+        self.tree = TreeDistance(self.maze.map != self.maze.WALL)
+
+        # precimpute the reward based on shortes path to the goal
+        cost = self.tree.distances(self.goal)
+        rewards = 1 - cost / numpy.nanmax(cost)
+        return numpy.power(rewards, self.alpha)
+
     def step(self, action):
         obs, rew, fin, info = super().step(action)
         pos = self.player
@@ -4,30 +4,96 @@ from gym import GoalEnv, spaces
 from ..env import RandomDiscoMaze, BaseMap
 
 
+def readonly(array):
+    """Get a read-only view of the array."""
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
 class RandomDiscoGoal(GoalEnv):
-    def __init__(self, n_row=10, n_col=10, *, n_colors=5, generator=None):
+    """Goal-conditioned DiscoMaze.
+
+    Details
+    -------
+    The `goal_mode` determines the representation of the achieved and the
+    desired goals: 'pixels' are the rgb frames of the full state, 'index'
+    are the class layers of the maze (see `RandomDiscoMaze.classes`), and
+    'position' are the coordinates of the player. The observations and the
+    'pixels' goals are in the `obs_format` of the wrapped env.
+
+    The observations are read-only views, and the desired goal is a single
+    immutable array shared by all steps of an episode.
+    """
+    goal_modes = 'pixels', 'index', 'position'
+
+    metadata = RandomDiscoMaze.metadata
+
+    # the phases profiled in addition to those of the wrapped env
+    perf_phases = {
+        'goal_reset': 'reset', 'goal_step': 'step', 'goal_obs': '_obs',
+    }
+
+    def __init__(self, n_row=10, n_col=10, *, goal_mode='pixels',
+                 profile=False, **kwargs):
         super().__init__()
+        assert goal_mode in self.goal_modes
+        self.goal_mode = goal_mode
 
+        # the other options are those of the wrapped env
         self.env = RandomDiscoMaze(n_row, n_col, n_targets=0,
-                                   n_colors=n_colors, generator=generator)
+                                   profile=bool(profile), **kwargs)
+
+        goal_space = self.env.observation_space
+        if self.goal_mode == 'index':
+            goal_space = spaces.Box(low=0, high=3, dtype=np.uint8,
+                                    shape=self.env.maze.shape)
+
+        elif self.goal_mode == 'position':
+            goal_space = spaces.Box(0, np.array(self.env.maze.shape) - 1,
+                                    dtype=int, shape=(2,))
 
         self.action_space = self.env.action_space
-        self.observation_space = spaces.Dict(dict.fromkeys([
-            'observation',
-            'achieved_goal',
-            'desired_goal',
-        ], self.env.observation_space))
+        self.observation_space = spaces.Dict(dict(
+            observation=self.env.observation_space,
+            achieved_goal=goal_space,
+            desired_goal=goal_space,
+        ))
+
+        # share the counters with the wrapped env
+        if profile:
+            self.env._perf.instrument(self, self.perf_phases)
+            if profile == 'info':
+                self.env._perf.attach(self)
 
         self.reset()
 
+        # the first call to `.reset` (re)starts from the episode 0
+        if self.env.episode_seed is not None:
+            self.env.episode = None
+
     def seed(self, seed):
         return self.env.seed(seed)
 
+    def perf_stats(self, *, clear=False):
+        return self.env.perf_stats(clear=clear)
+
+    def _achieved_goal(self, state):
+        if self.goal_mode == 'index':
+            return readonly(self.env.classes())
+
+        elif self.goal_mode == 'position':
+            return readonly(np.array(self.player))
+
+        return state
+
     def _obs(self):
+        # the state is re-created at every step, so sharing it is safe
+        state = readonly(self.env.formatted(self.env.state))
         return {
-            'observation': self.env.state.copy(),
-            'achieved_goal': self.env.state.copy(),
-            'desired_goal': self.goal_state.copy(),
+            'observation': state,
+            'achieved_goal': self._achieved_goal(state),
+            'desired_goal': self.desired_goal,
         }
 
     @property
@@ -39,30 +105,56 @@ class RandomDiscoGoal(GoalEnv):
         return self.env.viewer
 
     def compute_reward(self, achieved_goal, desired_goal, _info=None):
-        # the player is guaranteed to have a color distinct fomr the walls
-        achieved_goal = np.all(achieved_goal == self.env.COLORS[1], axis=-1)
-        desired_goal = np.all(desired_goal == self.env.COLORS[1], axis=-1)
+        """Vectorized reward for batches of goals in the env's `goal_mode`."""
+        achieved_goal = np.asarray(achieved_goal)
+        desired_goal = np.asarray(desired_goal)
+
+        if self.goal_mode == 'position':
+            # positions of shape `(..., 2)`
+            mask = ~np.all(achieved_goal == desired_goal, axis=-1)
+            return -mask.astype(np.float32)
+
+        if self.goal_mode == 'index':
+            # palette-index frames: the player has index 1
+            achieved_goal = achieved_goal == 1
+            desired_goal = desired_goal == 1
+
+        else:
+            # the player is guaranteed to have a color distinct fomr the walls
+            achieved_goal = self.env.is_player(achieved_goal)
+            desired_goal = self.env.is_player(desired_goal)
 
         # Deceptive reward: it is nonnegative only when the goal is achieved
         mask = ~(achieved_goal & desired_goal).any(axis=(-1, -2))
         return -mask.astype(np.float32)
 
-    def reset(self):
-        self.env.reset()
+    def reset(self, *, episode=None):
+        self.env.reset(episode=episode)
 
         # generate the goal coordinates and the state
-        empty = self.env.maze.coordinates_of(self.env.maze.EMPTY)
-        self.goal = i, j = tuple(self.env.generator_.choice(empty))
+        self.goal = i, j = tuple(
+            self.env.maze.sample_empty(self.env.generator_))
 
         # create a new map and generate a state for it
-        self.goal_maze = BaseMap(*self.env.maze.shape)
+        self.goal_maze = BaseMap(*self.env.maze.shape,
+                                 dtype=self.env.maze.map.dtype)
         self.goal_maze.map[:] = self.env.maze.map
 
         # deleted the current player and place another one at the goal
         self.goal_maze[self.goal] = self.env.PLAYER
         del self.goal_maze[self.player]
 
-        self.goal_state = self.env.update(maze=self.goal_maze)
+        self.goal_state = readonly(self.env.formatted(
+            self.env.update(maze=self.goal_maze)))
+
+        # the immutable desired goal is shared by all steps of the episode
+        self.desired_goal = self.goal_state
+        if self.goal_mode == 'index':
+            self.desired_goal = readonly(self.env.classes(maze=self.goal_maze))
+
+        elif self.goal_mode == 'position':
+            self.desired_goal = readonly(np.array(self.goal))
+
         return self._obs()
 
     def step(self, action):
@@ -74,5 +166,5 @@ class RandomDiscoGoal(GoalEnv):
             **info, "is_success": has_reached
         }
 
-    def render(self, mode='state_pixels'):
-        return self.env.render(mode)
+    def render(self, mode='state_pixels', *, scale=5):
+        return self.env.render(mode, scale=scale)
@@ -0,0 +1,184 @@
+import numpy as np
+
+from gym.spaces import Box, MultiDiscrete
+
+from .. import maze
+from ..env import RandomDiscoMaze, MazeMap
+
+
+class MultiAgentDiscoMaze(RandomDiscoMaze):
+    """DiscoMaze with many agents moving at once in the same maze.
+
+    Details
+    -------
+    The agents have ids `1..K`, followed by the targets, and their positions
+    are kept in the `(K, 2)` array `positions`, as well as in `objects`. The
+    `step` takes an array of `K` actions and resolves all moves at once:
+    an agent is blocked by the cells occupied by the agents at the start of
+    the step, and, of the agents contesting the same cell, a random one
+    moves in, while the others stay. The winner consumes the target, or
+    displaces the wall and dies, as in `RandomDiscoMaze`. The dead agents
+    stay in place.
+
+    The rewards are per agent, and the episode ends when all agents are
+    dead, or no targets are left. The observation is the `(K, ...)` stack
+    of the agents' fields of view cut from a single repaint of the state.
+    """
+    def __init__(self, n_row=10, n_col=10, *, n_agents=2, **kwargs):
+        # the observations of the agents are not stacked
+        assert n_agents > 0 and kwargs.get('frame_stack') is None
+        self.n_agents = n_agents
+
+        # the displacements of the agents by each action
+        _, _, du, dv = zip(*map(maze.ATLAS.get, self.directions))
+        self._moves = np.stack((du, dv), -1)
+
+        # the state padded by the fields of view, allocated on demand
+        self._padded = None
+
+        # the other options are those of `RandomDiscoMaze`
+        super().__init__(n_row, n_col, **kwargs)
+
+        self.action_space = MultiDiscrete([len(self.directions)] * n_agents)
+        self.observation_space = Box(
+            low=self.observation_space.low.min(),
+            high=self.observation_space.high.max(), dtype=np.uint8,
+            shape=(n_agents, *self.observation_space.shape))
+
+    @property
+    def agents(self):
+        """The ids of the agents."""
+        return np.arange(self.PLAYER, self.PLAYER + self.n_agents)
+
+    def reset(self, *, episode=None):
+        self.start_episode(episode)
+        self.maze = self.generate()
+
+        # place the agents at distinct random empty cells
+        self.positions = self.maze.sample_empty(self.generator_,
+                                                size=self.n_agents)
+        self.maze.map[tuple(self.positions.T)] = self.agents
+        self.objects = [None, *map(tuple, self.positions.tolist())]
+        self.is_alive = np.ones(self.n_agents, dtype=bool)
+
+        # ... and the targets
+        self.targets = set()
+        self.spawn(self.n_targets)
+
+        # index the empty cells for the cheap respawns
+        if self.respawn_targets:
+            self.maze.index_empty()
+
+        self.repaint()
+        return self.observation()
+
+    def step(self, actions):
+        rewards = np.zeros(self.n_agents)
+        if actions is not None:
+            self._resolve(np.asarray(actions), rewards)
+
+        # check termination conditions: maze hazards, or no targets left
+        any_targets = bool(self.targets) or (self.n_targets == 0)
+        is_terminal = not any_targets or not self.is_alive.any()
+
+        self.repaint()
+        return self.observation(), rewards, is_terminal, dict(
+            is_alive=self.is_alive.copy())
+
+    def _resolve(self, actions, rewards):
+        """Move the agents by the actions, and collect the rewards."""
+        map, n_cols = self.maze.map, self.maze.shape[1]
+
+        # only the live agents, which do not stay in place, move
+        moves = self._moves[actions]
+        index = np.flatnonzero(self.is_alive & moves.any(-1))
+        if not len(index):
+            return
+
+        src = self.positions[index]
+        dst = src + moves[index]
+
+        # the cells of the agents (before the step) are obstructed
+        dest = map[dst[:, 0], dst[:, 1]]
+        free = (dest < self.PLAYER) | (dest >= self.PLAYER + self.n_agents)
+
+        # the contested cells go to the agents with the least random keys
+        index, src, dst, dest = index[free], src[free], dst[free], dest[free]
+        cells = dst[:, 0] * n_cols + dst[:, 1]
+        order = np.lexsort((self.generator_.random(len(index)), cells))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = cells[order[1:]] != cells[order[:-1]]
+
+        order = order[first]
+        index, src, dst = index[order], src[order], dst[order]
+        dest = dest[order]
+
+        # relocate the agents, consuming the targets and displacing the walls
+        map[src[:, 0], src[:, 1]] = MazeMap.EMPTY
+        map[dst[:, 0], dst[:, 1]] = index + self.PLAYER
+        self.positions[index] = dst
+        for k, p in zip(index.tolist(), dst.tolist()):
+            self.objects[k + self.PLAYER] = tuple(p)
+
+        self.is_alive[index[dest == MazeMap.WALL]] = False
+        if self.respawn_targets:
+            self.maze.reindex(*src.tolist(), *dst.tolist())
+
+        else:
+            # only the displaced walls change the open directions
+            self.maze.reindex(*dst[dest == MazeMap.WALL].tolist())
+
+        # check winning conditions
+        is_target = dest >= self.PLAYER + self.n_agents
+        rewards[index[is_target]] = 1.
+        for oid in dest[is_target].tolist():
+            self.targets.remove(oid)
+            self.objects[oid] = None
+            self._is_target[oid] = False
+            if self.respawn_targets:
+                self.respawn(oid)
+
+    def action_mask(self, *, by=None):
+        """Get the `(K, n_actions)` masks of the agents' safe actions."""
+        if by is not None:
+            return super().action_mask(by=by)
+
+        return self.safe_actions(*self.positions.T)
+
+    def observation(self, *, by=None, out=None):
+        """Get the stacked observations of all agents, or of one of them."""
+        if by is not None:
+            return super().observation(by=by, out=out)
+
+        state = self.state
+        if self.field is None:
+            # every agent observes the full state
+            pixels = np.broadcast_to(state, (self.n_agents, *state.shape))
+            return self.formatted(pixels, out=out)
+
+        # pad the state with empty space, so that every field fits inside
+        #  (the empty space has zero pixels in every format)
+        r, c = self.field
+        n_row, n_col, n_channels = state.shape
+        if self._padded is None:
+            self._padded = np.zeros((n_row + 2 * r, n_col + 2 * c,
+                                     n_channels), dtype=np.uint8)
+
+        padded = self._padded
+        padded[r:r + n_row, c:c + n_col] = state
+
+        # gather the fields centered at the agents (shifted by the padding)
+        i, j = self.positions.T
+        rows = i[:, np.newaxis, np.newaxis] + np.arange(1 + 2 * r)[:, None]
+        cols = j[:, np.newaxis, np.newaxis] + np.arange(1 + 2 * c)
+        return self.formatted(padded[rows, cols], out=out)
+
+    def snapshot(self):
+        snapshot = super().snapshot()
+        snapshot['is_alive'] = self.is_alive.tolist()
+        return snapshot
+
+    def restore(self, snapshot):
+        super().restore(snapshot)
+        self.is_alive = np.array(snapshot['is_alive'], dtype=bool)
+        self.positions = np.array(self.objects[1:1 + self.n_agents])
@@ -19,10 +19,33 @@ ATLAS = {
 DIRECTIONS = [0, W, S, E, N]
 DIR_LABELS = ['stay', 'west', 'south', 'east', 'north']
 
+# the perfect maze generators: random dfs, and Eller's row-by-row
+ALGORITHMS = 'dfs', 'eller'
 
-def generate(n_row, n_col, *, generator=None):
+
+def generate(n_row, n_col, *, generator=None, size=None, out=None,
+             n_threads=0, algorithm='dfs'):
     """Perfect Maze generator using random DFS.
 
+    Parameters
+    ----------
+    algorithm : str, default='dfs'
+        The random 'dfs' needs O(n_row n_col) working memory. 'eller' makes
+        the maze one row at a time in O(n_col) working memory, and streams
+        the rows into `out`, which may be memory-mapped. Its mazes have more
+        short horizontal corridors, and are not the same as those of 'dfs'.
+
+    size : int, optional
+        The number of mazes to generate in parallel (without the GIL). Each
+        maze uses an independent bit generator spawned from a seed sequence,
+        the entropy for which is drawn from `generator`. The result does not
+        depend on the number of threads `n_threads` (zero means all cores).
+
+    out : array, optional
+        A preallocated bool array of shape `(size, 2 n_row + 1, 2 n_col + 1)`
+        to write the batch of mazes into, or `(2 n_row + 1, 2 n_col + 1)`
+        to write a single maze into.
+
     Details
     -------
     Implements iterative version of the depth-first maze builder.
@@ -31,10 +54,112 @@ def generate(n_row, n_col, *, generator=None):
     -----
     https://en.wikipedia.org/wiki/Maze_generation_algorithm#Iterative_implementation
     https://web.archive.org/web/20150816164625/http://mazeworks.com/mazegen/mazetut/index.htm
+    http://www.neocomputer.org/projects/eller.html
     """
+    assert algorithm in ALGORITHMS
+
     # re-package the random bit generator from the legacy random state
     if isinstance(generator, np.random.RandomState):
         generator = generator._bit_generator
     generator = np.random.default_rng(generator)
 
-    return _maze.generate_perfect_maze(n_row, n_col, generator=generator)
+    if size is None:
+        if algorithm == 'eller':
+            return _maze.generate_eller_maze(n_row, n_col, out=out,
+                                             generator=generator)
+
+        return _maze.generate_perfect_maze(n_row, n_col, out=out,
+                                           generator=generator)
+
+    seeds = np.random.SeedSequence(generator.bit_generator.random_raw(2))
+    return _maze.generate_perfect_mazes(size, n_row, n_col, seeds=seeds,
+                                        out=out, n_threads=n_threads,
+                                        eller=algorithm == 'eller')
+
+
+class TreeDistance:
+    """Shortest path distance oracle for the free cells of a perfect maze.
+
+    Details
+    -------
+    The free cells of a perfect maze form a tree, hence the distance between
+    any two cells is given by the depths of the cells and their lowest common
+    ancestor (LCA). The tree is rooted and indexed by a linear-time DFS, and
+    a binary lifting table of ancestors answers LCA queries in O(log n).
+    """
+    def __init__(self, free, root=None):
+        free = np.ascontiguousarray(free, dtype=bool)
+        if root is None:
+            root = np.unravel_index(np.flatnonzero(free)[0], free.shape)
+
+        self.shape = free.shape
+        self.parent, self.depth, self.tin, self.tout = \
+            _maze.spanning_tree(free, *root)
+        self._up = None
+
+    @property
+    def up(self):
+        """The 2^k-th ancestors of the cells (the root is its own parent)."""
+        if self._up is None:
+            up = np.where(self.parent < 0, np.arange(self.parent.size),
+                          self.parent)
+            levels = [up]
+            for _ in range(int(self.depth.max()).bit_length()):
+                levels.append(levels[-1][levels[-1]])
+            self._up = np.stack(levels)
+
+        return self._up
+
+    def is_ancestor(self, x, y):
+        """Check if `x` is an ancestor of `y` (flat indices)."""
+        return (self.tin[x] <= self.tin[y]) & (self.tin[y] <= self.tout[x])
+
+    def lca(self, x, y):
+        """Get the lowest common ancestor of `x` and `y` (flat indices)."""
+        x, y = np.broadcast_arrays(x, y)
+
+        # lift `x` to the highest ancestor, which is not an ancestor of `y`
+        is_above = self.is_ancestor(x, y)
+        for up in self.up[::-1]:
+            x = np.where(is_above | self.is_ancestor(up[x], y), x, up[x])
+
+        return np.where(is_above, x, self.up[0, x])
+
+    def distance(self, p, q):
+        """Get the lengths of the shortest paths between the cells.
+
+        Details
+        -------
+        The cells `p` and `q` are `(i, j)` coordinates, or arrays of them of
+        shape `(..., 2)`. The distance to unreachable cells is -1.
+        """
+        x = np.ravel_multi_index(np.moveaxis(np.asarray(p), -1, 0), self.shape)
+        y = np.ravel_multi_index(np.moveaxis(np.asarray(q), -1, 0), self.shape)
+
+        dist = self.depth[x] + self.depth[y] - 2 * self.depth[self.lca(x, y)]
+        return np.where((self.tin[x] < 0) | (self.tin[y] < 0), -1, dist)
+
+    def distances(self, p):
+        """Get the field of the shortest path lengths from the given cell.
+
+        Details
+        -------
+        The intervals of preorder indices spanned by the subtrees of the cells
+        on the path from the root to `p` are nested, so the number of them,
+        which cover the preorder index of a cell, equals the depth of its LCA
+        with `p` plus one. Unreachable cells have `nan` distance.
+        """
+        x = np.ravel_multi_index(p, self.shape)
+
+        # mark the ancestors of `x` and count their covering intervals
+        anc = (self.tin >= 0) & self.is_ancestor(slice(None), x)
+        n_nodes = self.tin.max() + 2
+        cover = np.bincount(self.tin[anc], minlength=n_nodes) \
+            - np.bincount(self.tout[anc] + 1, minlength=n_nodes)
+        lca_depth = np.cumsum(cover) - 1
+
+        dist = np.full(self.depth.shape, np.nan)
+        reachable = self.tin >= 0
+        dist[reachable] = self.depth[reachable] + self.depth[x] \
+            - 2 * lca_depth[self.tin[reachable]]
+        return dist.reshape(self.shape)
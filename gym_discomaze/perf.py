@@ -0,0 +1,120 @@
+import os
+import time
+
+from functools import wraps
+from collections import defaultdict
+
+
+class PerfCounters:
+    """Monotonic timers and call counters of the named phases of an env.
+
+    Details
+    -------
+    The phases are the methods of an instance, which `.instrument` shadows
+    by timed wrappers in the instance's `__dict__`, so that the envs, which
+    are not instrumented, do not pay anything. The timings are inclusive,
+    e.g. the time of `step` includes that of `update` and `observation`.
+    """
+    def __init__(self):
+        self.calls, self.times = defaultdict(int), defaultdict(int)
+
+    def timed(self, phase, fn):
+        """Wrap the callable into a timer of the phase."""
+        calls, times, clock = self.calls, self.times, time.perf_counter_ns
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = clock()
+            try:
+                return fn(*args, **kwargs)
+
+            finally:
+                times[phase] += clock() - t0
+                calls[phase] += 1
+
+        return wrapper
+
+    def instrument(self, obj, phases):
+        """Time the methods of the object given by the `phase: name` dict."""
+        for phase, name in phases.items():
+            setattr(obj, name, self.timed(phase, getattr(obj, name)))
+
+        return obj
+
+    def attach(self, obj):
+        """Report the stats in the `info` of the object's `.step`."""
+        step = obj.step
+
+        @wraps(step)
+        def wrapper(action):
+            obs, reward, done, info = step(action)
+            return obs, reward, done, {**info, 'perf': self.stats()}
+
+        obj.step = wrapper
+        return obj
+
+    def stats(self):
+        """Get the number of calls, and the total and mean time in seconds."""
+        return {phase: dict(calls=n, total=self.times[phase] * 1e-9,
+                            mean=self.times[phase] * 1e-9 / n)
+                for phase, n in self.calls.items()}
+
+    def clear(self):
+        self.calls.clear()
+        self.times.clear()
+
+    def export(self, path, **labels):
+        """Append the counters to a line-based file, one phase per line.
+
+        Details
+        -------
+        Each line consists of space-separated `key=value` fields: the phase,
+        the number of calls, the total time in nanoseconds, the process id
+        and any extra labels. The lines of many processes may be appended
+        to the same file, and summed by `aggregate`.
+        """
+        labels = ''.join(f' {k}={v}' for k, v in labels.items())
+        lines = [f'phase={phase} calls={n} total_ns={self.times[phase]}'
+                 f' pid={os.getpid()}{labels}\n'
+                 for phase, n in self.calls.items()]
+
+        # a single write of the whole block keeps the appends from many
+        #  processes from interleaving
+        with open(path, 'a') as f:
+            f.write(''.join(lines))
+
+
+def aggregate(*paths, by=()):
+    """Sum the exported counters over the files, grouped by the labels."""
+    stats = defaultdict(lambda: dict(calls=0, total_ns=0))
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                fields = dict(kv.split('=', 1) for kv in line.split())
+                key = fields['phase'], *(fields.get(k) for k in by)
+                stats[key]['calls'] += int(fields['calls'])
+                stats[key]['total_ns'] += int(fields['total_ns'])
+
+    return dict(stats)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Aggregate the exported performance counters.',
+        add_help=True)
+
+    parser.add_argument(
+        'paths', type=str, nargs='+',
+        help='the files with the exported counters.')
+
+    parser.add_argument(
+        '--by', type=str, nargs='+', required=False, default=(),
+        help='the labels to group the counters by, e.g. `pid`.')
+
+    args = parser.parse_args()
+    for key, stat in sorted(aggregate(*args.paths, by=args.by).items()):
+        mean = stat['total_ns'] / max(stat['calls'], 1) * 1e-3
+        print(f"{' '.join(map(str, key)):40s} {stat['calls']:12d}"
+              f" {stat['total_ns'] * 1e-9:12.3f}s {mean:12.2f}us")
@@ -0,0 +1,315 @@
+import json
+import zlib
+import struct
+import numpy as np
+
+from gym import Wrapper
+
+from .env import RandomDiscoMaze, bit_state
+from .ext.multi import MultiAgentDiscoMaze
+
+
+# file header: magic, format version and the length of the env's config
+HEADER = struct.Struct('<8sII')
+# episode record: the number of steps and checkpoints
+RECORD = struct.Struct('<QI')
+# checkpoint: the number of steps taken and the size of the packed snapshot
+CHECKPOINT = struct.Struct('<qI')
+# file footer: the offset of the episode index and the number of episodes
+FOOTER = struct.Struct('<QQ8s')
+
+MAGIC, VERSION = b'DISCOREC', 1
+NO_ACTION = 255  # the action `None`, i.e. the 'no-op'
+
+
+def pack_snapshot(snapshot):
+    """Serialize the env's snapshot into compressed bytes."""
+    # the arrays are described in the json, and appended raw in order
+    meta, raw = dict(snapshot), []
+    meta['arrays'] = [k for k, v in meta.items() if isinstance(v, np.ndarray)]
+    for key in meta['arrays']:
+        array = meta.pop(key)
+        meta[key] = array.dtype.str, array.shape
+        raw.append(array.tobytes())
+
+    text = json.dumps(meta).encode()
+    return zlib.compress(struct.pack('<I', len(text)) + text + b''.join(raw))
+
+
+def unpack_snapshot(blob):
+    """Deserialize the env's snapshot from compressed bytes."""
+    data = zlib.decompress(blob)
+    size, = struct.unpack_from('<I', data)
+    snapshot = json.loads(data[4:4 + size])
+
+    # the older records have only the map
+    offset = 4 + size
+    for key in snapshot.pop('arrays', ['map'] if 'map' in snapshot else []):
+        dtype, shape = snapshot[key]
+        array = np.frombuffer(data, dtype=dtype, count=np.prod(shape),
+                              offset=offset)
+        snapshot[key] = array.reshape(shape).copy()
+        offset += array.nbytes
+
+    if 'objects' in snapshot:
+        snapshot['objects'] = [p if p is None else tuple(p)
+                               for p in snapshot['objects']]
+
+    return snapshot
+
+
+class EpisodeRecorder(Wrapper):
+    """Record the episodes of a Random Disco Maze as seeds and actions.
+
+    Details
+    -------
+    An episode is fully determined by the state of the random generator
+    before `reset` and the actions, which are all that is stored, together
+    with periodic snapshots of the env taken every `interval` steps. The
+    frames are reconstructed lazily by `EpisodeReader`, which rebuilds the
+    core `RandomDiscoMaze` from the recorded config.
+
+    The `MultiAgentDiscoMaze` is recorded with a row of `n_agents` actions
+    per step, and is rebuilt by the reader if the config has `n_agents`.
+
+    The file is finalized by `.close`.
+    """
+    def __init__(self, env, path, *, interval=64):
+        super().__init__(env)
+
+        core = env.unwrapped
+        # the reader rebuilds exactly the core or the multi-agent env,
+        #  whereas the other subclasses may draw randomness of their own,
+        #  e.g. the goals of the explore env, which is never drawn on replay
+        assert type(core) in (RandomDiscoMaze, MultiAgentDiscoMaze)
+        assert interval > 0
+        # the banked mazes cannot be rebuilt from the config
+        assert core.maze_bank is None and core.maze_file is None
+
+        self.config = dict(n_row=core.n_row, n_col=core.n_col,
+                           n_colors=len(core.COLORS) - 3,
+                           n_targets=core.n_targets, field=core.field,
+                           color_stream=core.color_stream,
+                           walls_only=core.walls_only,
+                           obs_format=core.obs_format,
+                           frame_stack=core.frame_stack,
+                           lazy_render=core.lazy_render,
+                           respawn_targets=core.respawn_targets,
+                           episode_seed=core.episode_seed)
+        self.interval = interval
+
+        # the multi-agent env takes a row of actions per step
+        self.n_agents, self._no_action = 1, NO_ACTION
+        if isinstance(core, MultiAgentDiscoMaze):
+            self.config['n_agents'] = self.n_agents = core.n_agents
+            self._no_action = (NO_ACTION,) * core.n_agents
+
+        text = json.dumps(self.config).encode()
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, len(text)) + text)
+        self._index, self._episode = [], None
+
+    def reset(self, **kwargs):
+        self._flush()
+
+        # the episode starts from the generator's state before the reset
+        core = self.env.unwrapped
+        start = dict(generator=bit_state(core.generator_))
+        if core._colors is not None:
+            start['colors'] = core._colors.getstate()
+
+        # ... or, with `episode_seed`, from its own stream, see `.reset`,
+        #  keyed by the current seed, which `.seed` may have changed
+        obs = self.env.reset(**kwargs)
+        if core.episode is not None:
+            start = dict(episode=core.episode, episode_seed=core.episode_seed)
+        self._episode = [], [(-1, start)]
+
+        return obs
+
+    def step(self, action):
+        actions, checkpoints = self._episode
+
+        # take a snapshot after every `interval`-th frame has been painted
+        if actions and len(actions) % self.interval == 0:
+            checkpoints.append((len(actions), self.env.unwrapped.snapshot()))
+
+        result = self.env.step(action)
+        actions.append(self._no_action if action is None else action)
+        return result
+
+    def _flush(self):
+        if self._episode is None:
+            return
+
+        actions, checkpoints = self._episode
+        self._index.append(self._file.tell())
+        self._file.write(RECORD.pack(len(actions), len(checkpoints)))
+        self._file.write(np.array(actions, dtype=np.uint8).reshape(
+            len(actions), self.n_agents).tobytes())
+        for n_steps, snapshot in checkpoints:
+            blob = pack_snapshot(snapshot)
+            self._file.write(CHECKPOINT.pack(n_steps, len(blob)) + blob)
+
+        self._episode = None
+
+    def close(self):
+        if not self._file.closed:
+            self._flush()
+
+            # append the index of episodes' offsets
+            offset = self._file.tell()
+            self._file.write(np.array(self._index, dtype='<u8').tobytes())
+            self._file.write(FOOTER.pack(offset, len(self._index), MAGIC))
+            self._file.close()
+
+        return super().close()
+
+
+class Episode:
+    """A recorded episode with lazily reconstructed observations."""
+    def __init__(self, env, actions, checkpoints):
+        self.env, self.actions, self.checkpoints = env, actions, checkpoints
+
+    def __len__(self):
+        # the frames after the reset and every step
+        return len(self.actions) + 1
+
+    def __getitem__(self, t):
+        if not -len(self) <= t < len(self):
+            raise IndexError(t)
+
+        t = t % len(self)
+        obs, _, _ = next(self.replay(t, t + 1))
+        return obs
+
+    def __iter__(self):
+        return (obs for obs, _, _ in self.replay())
+
+    def _action(self, t):
+        action = self.actions[t]
+        if action.ndim:
+            # the row of the agents' actions, with `None` for all of them
+            if (action == NO_ACTION).all():
+                return None
+
+            return action.astype(int)
+
+        return None if action == NO_ACTION else int(action)
+
+    def _frame(self, obs):
+        # the stacked frames are a view of the env's ring of frames, which
+        #  is overwritten by the next step
+        return obs if self.env.frame_stack is None else obs.copy()
+
+    def replay(self, start=0, stop=None):
+        """Reconstruct the observations, rewards and terminations.
+
+        Details
+        -------
+        Restores the latest snapshot before the frame `start`, and steps the
+        env with the recorded actions. The frames are decoded by the env of
+        the reader, so iterators over different episodes must not be
+        interleaved.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+
+        # the latest checkpoint before `start`
+        steps = [n for n, _ in self.checkpoints]
+        n_steps, blob = self.checkpoints[np.searchsorted(steps, start) - 1]
+
+        env, snapshot = self.env, unpack_snapshot(blob)
+        if n_steps < 0:
+            # the checkpoint before the reset has only the generators, or
+            #  the key and the index of the episode with `episode_seed`
+            episode = snapshot.get('episode')
+            if episode is not None:
+                env.episode_seed = snapshot.get('episode_seed',
+                                                env.episode_seed)
+
+            else:
+                env.generator_.bit_generator.state = snapshot['generator']
+                if 'colors' in snapshot:
+                    env._colors.setstate(snapshot['colors'])
+
+            obs, n_steps = env.reset(episode=episode), 0
+            reward, done = 0., False
+            if start == 0 < stop:
+                yield self._frame(obs), reward, done
+
+        else:
+            env.restore(snapshot)
+
+        # the frame `t + 1` follows the `t`-th action
+        for t in range(n_steps, stop - 1):
+            obs, reward, done, _ = env.step(self._action(t))
+            if t + 1 >= start:
+                yield self._frame(obs), reward, done
+
+
+class EpisodeReader:
+    """Random access to the episodes recorded by `EpisodeRecorder`."""
+    def __init__(self, path):
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+        self.data = data.view(np.ndarray)
+
+        magic, version, size = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError(f'`{path}` is not an episode record')
+
+        if version != VERSION:
+            raise ValueError(f'Unsupported episode record version {version}')
+
+        offset, n_episodes, magic = FOOTER.unpack_from(
+            self.data, len(self.data) - FOOTER.size)
+        if magic != MAGIC:
+            raise ValueError(f'`{path}` is not finalized')
+
+        self.config = json.loads(bytes(self.data[HEADER.size:][:size]))
+        if self.config['field'] is not None:
+            self.config['field'] = tuple(self.config['field'])
+
+        self.index = np.frombuffer(self.data, dtype='<u8', count=n_episodes,
+                                   offset=offset)
+
+        # the env for decoding the frames
+        self.n_agents = self.config.get('n_agents', 1)
+        if 'n_agents' in self.config:
+            self.env = MultiAgentDiscoMaze(**self.config)
+
+        else:
+            self.env = RandomDiscoMaze(**self.config)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, index):
+        offset = int(self.index[index])
+        n_steps, n_checkpoints = RECORD.unpack_from(self.data, offset)
+
+        # the multi-agent env has a row of actions per step
+        offset, size = offset + RECORD.size, n_steps * self.n_agents
+        actions = self.data[offset:offset + size]
+        if 'n_agents' in self.config:
+            actions = actions.reshape(n_steps, self.n_agents)
+
+        offset, checkpoints = offset + size, []
+        for _ in range(n_checkpoints):
+            step, size = CHECKPOINT.unpack_from(self.data, offset)
+            offset += CHECKPOINT.size
+            checkpoints.append((step, self.data[offset:offset + size]))
+            offset += size
+
+        return Episode(self.env, actions, checkpoints)
+
+    def __iter__(self):
+        return (self[j] for j in range(len(self)))
+
+    def stream(self):
+        """Stream the `(obs, act, rew, next_obs, done)` transitions."""
+        for episode in self:
+            frames = episode.replay()
+            obs, _, _ = next(frames)
+            for t, (next_obs, rew, done) in enumerate(frames):
+                yield obs, episode._action(t), rew, next_obs, done
+                obs = next_obs
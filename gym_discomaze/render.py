@@ -1,8 +1,11 @@
 import sys
+import time
 import numpy as np
 
+from collections import deque
+
 from pyglet import gl
-from pyglet.image import ImageData
+from pyglet.image import Texture
 from pyglet.window import Window, key
 from pyglet.canvas import Display
 
@@ -17,6 +20,14 @@ class SimpleImageViewer(Window):
         assert all(isinstance(p, (int, float)) and p > 0 for p in scale)
         self._init_scale = self.scale = scale
 
+        # the persistent bottom-up rgba buffer of the texture
+        self._buffer = None
+
+        # the durations of `imshow` calls and the intervals between them
+        self.frame_times = deque(maxlen=100)
+        self.frame_intervals = deque(maxlen=100)
+        self._last_frame = None
+
         super().__init__(caption=caption, resizable=False,
                          vsync=vsync, display=Display(display))
 
@@ -87,29 +98,59 @@ class SimpleImageViewer(Window):
         if not self.resizeable:  # tom-eyy-teu, tom-ahh-teu
             super().on_resize(width, height)  # call parent's method
 
+    @property
+    def fps(self):
+        """The recent rate of frames shown per second."""
+        if not self.frame_intervals:
+            return float('nan')
+
+        return len(self.frame_intervals) / sum(self.frame_intervals)
+
     def imshow(self, data):
         if not self.isopen:
             return False
 
+        t0 = time.perf_counter()
         assert data.dtype == np.uint8
 
         height, width, *channels = data.shape
         assert len(channels) == 1 and channels[0] in (3, 4)
-        format = 'RGBA' if channels[0] == 4 else 'RGB'
 
-        # switch to our GL context and create the texture
+        # switch to our GL context
         self.switch_to()
-        self.texture = ImageData(
-            width, height, format, data.tobytes(),
-            pitch=-width * len(format)).get_texture()
 
-        # resize the window to the array's dims
-        sw, sh = self.scale
-        self.set_size(self.texture.width * sw, self.texture.height * sh)
+        # (re)create the texture and resize the window only if the dims
+        #  of the frame change
+        if self._buffer is None or self._buffer.shape[:2] != (height, width):
+            self._buffer = np.full((height, width, 4), 255, dtype=np.uint8)
+            self.texture = Texture.create(width, height, gl.GL_RGBA)
+
+            sw, sh = self.scale
+            self.set_size(self.texture.width * sw, self.texture.height * sh)
+
+        # copy into the buffer bottom-up, as gl expects, keeping the opaque
+        #  alpha of rgb frames
+        np.copyto(self._buffer[::-1, :, :channels[0]], data)
+        if channels[0] == 3:
+            self._buffer[..., 3] = 255
+
+        # upload the pixels into the existing texture in-place
+        gl.glBindTexture(self.texture.target, self.texture.id)
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)
+        gl.glTexSubImage2D(self.texture.target, self.texture.level, 0, 0,
+                           width, height, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE,
+                           self._buffer.ctypes.data)
 
         # handle os events and redraw
         self.dispatch_events()
         self.on_draw()
         self.flip()
 
+        # keep track of the frame time and rate
+        t1 = time.perf_counter()
+        self.frame_times.append(t1 - t0)
+        if self._last_frame is not None:
+            self.frame_intervals.append(t1 - self._last_frame)
+        self._last_frame = t1
+
         return self.isopen
@@ -0,0 +1,192 @@
+import numpy as np
+
+from gym.spaces import Discrete, Box
+from gym.vector import VectorEnv
+
+from sys import maxsize
+
+from . import maze
+from .env import MazeMap, RandomDiscoMaze, compact_dtype, disco_palette
+
+
+class VectorDiscoMaze(VectorEnv):
+    """A batch of Random Disco Mazes stepped in lockstep.
+
+    Details
+    -------
+    Keeps the state of all mazes in struct-of-arrays numpy form: the maps
+    in a single `(N, H, W)` array with the same object ids as in `MazeMap`,
+    and the positions of the player and the targets in an `(N, 2 + k, 2)`
+    array indexed by the object id, like `RandomDiscoMaze.objects`. Absent
+    objects, e.g. consumed targets, have negative coordinates.
+
+    The game rules are exactly those of `RandomDiscoMaze.step`, and the
+    finished mazes are automatically reset, like in gym's vector envs.
+    """
+    directions = maze.DIRECTIONS[:]
+
+    PLAYER = RandomDiscoMaze.PLAYER
+
+    def __init__(self, num_envs, n_row=10, n_col=10, *, n_colors=5,
+                 n_targets=1, field=None, generator=None):
+        assert field is None or isinstance(field, tuple)
+        self.field = field
+
+        # re-package the random bit generator from the legacy random state
+        if isinstance(generator, np.random.RandomState):
+            generator = generator._bit_generator
+        self.generator_ = np.random.default_rng(generator)
+
+        self.COLORS = disco_palette(n_colors)
+        self.palette = np.array(self.COLORS, dtype=np.uint8)
+
+        self.n_row, self.n_col, self.n_targets = n_row, n_col, n_targets
+
+        # the displacements of the player by each action
+        _, _, du, dv = zip(*map(maze.ATLAS.get, self.directions))
+        self._du, self._dv = np.array(du), np.array(dv)
+
+        # struct-of-arrays state of the mazes
+        shape = 1 + 2 * n_row, 1 + 2 * n_col
+        self.maps = np.full((num_envs, *shape), MazeMap.EMPTY,
+                            dtype=compact_dtype(2 + n_targets))
+        self.objects = np.full((num_envs, 2 + n_targets, 2), -1, dtype=int)
+        self.n_left = np.zeros(num_envs, dtype=int)
+        self._actions = np.zeros(num_envs, dtype=int)
+
+        if self.field is not None:
+            # the field of view is centered around the player
+            shape = 1 + 2 * self.field[0], 1 + 2 * self.field[1]
+
+        super().__init__(
+            num_envs,
+            Box(low=0, high=255, dtype=np.uint8, shape=(*shape, 3)),
+            Discrete(len(self.directions)),
+        )
+        self.named_actions = dict(zip(maze.DIR_LABELS,
+                                      range(len(self.directions))))
+
+        self.state = None
+        self.reset()
+
+    def _reset(self, index):
+        """Regenerate the mazes and respawn the objects in the given envs."""
+        if not len(index):
+            return
+
+        walls = maze.generate(self.n_row, self.n_col, size=len(index),
+                              generator=self.generator_)
+        self.maps[index] = np.where(walls, MazeMap.WALL, MazeMap.EMPTY)
+
+        # uniformly pick distinct empty cells by taking the smallest random
+        #  keys: the player gets the least one, and the targets the rest
+        n_objects = 1 + self.n_targets
+        flat = self.maps[index].reshape(len(index), -1)
+        keys = self.generator_.random(flat.shape)
+        keys[flat != MazeMap.EMPTY] = np.inf
+
+        cells = np.argpartition(keys, n_objects - 1, axis=1)[:, :n_objects]
+        order = np.take_along_axis(keys, cells, 1).argsort(axis=1)
+        i, j = np.divmod(np.take_along_axis(cells, order, 1),
+                         self.maps.shape[2])
+
+        self.maps[index[:, np.newaxis], i, j] = np.arange(1, 1 + n_objects)
+        self.objects[index, 1:] = np.stack((i, j), -1)
+        self.n_left[index] = self.n_targets
+
+    def reset_wait(self, **kwargs):
+        self._reset(np.arange(self.num_envs))
+
+        self.state = self.update()
+        return self.observation()
+
+    def action_mask(self, *, by=PLAYER):
+        """Get the `(N, n_actions)` masks of the safe actions in each env.
+
+        Details
+        -------
+        The safe actions do not hit a wall, see `RandomDiscoMaze.action_mask`.
+        """
+        i, j = self.objects[:, by].T
+        n = np.arange(self.num_envs)[:, np.newaxis]
+        u, v = i[:, np.newaxis] + self._du, j[:, np.newaxis] + self._dv
+        return self.maps[n, u, v] != MazeMap.WALL
+
+    def palette_index(self):
+        """Get the palette indices of all cells with randomly lit walls."""
+        index = self.generator_.integers(3, len(self.palette),
+                                         size=self.maps.shape)
+
+        # only the live targets are on the maps (consumed ones are deleted)
+        index[self.maps == MazeMap.EMPTY] = 0
+        index[self.maps == self.PLAYER] = 1
+        index[self.maps > self.PLAYER] = 2
+
+        return index
+
+    def update(self):
+        return self.palette[self.palette_index()]
+
+    def observation(self, *, by=PLAYER):
+        """Get the batch of pixels observed from the object's vantage point."""
+        if self.field is None:
+            return self.state
+
+        # pad the state with empty space so that every field fits inside
+        r, c = self.field
+        padded = np.pad(self.state, ((0, 0), (r, r), (c, c), (0, 0)))
+
+        # gather the fields centered at the objects (shifted by the padding)
+        i, j = self.objects[:, by].T
+        n = np.arange(self.num_envs)[:, np.newaxis, np.newaxis]
+        rows = i[:, np.newaxis, np.newaxis] + np.arange(1 + 2 * r)[:, None]
+        cols = j[:, np.newaxis, np.newaxis] + np.arange(1 + 2 * c)
+        return padded[n, rows, cols]
+
+    def step_async(self, actions):
+        self._actions[:] = actions
+
+    def step_wait(self, **kwargs):
+        n = np.arange(self.num_envs)
+        i, j = self.objects[:, self.PLAYER].T
+
+        # displacing self is always successful
+        du, dv = self._du[self._actions], self._dv[self._actions]
+        moving = (du != 0) | (dv != 0)
+        u, v = i + du, j + dv
+
+        dest = np.where(moving, self.maps[n, u, v], MazeMap.EMPTY)
+
+        # targets are consumed and walls displaced, and, since there are
+        #  no other objects, the moving player always relocates
+        n, i, j, u, v = n[moving], i[moving], j[moving], u[moving], v[moving]
+        self.maps[n, i, j] = MazeMap.EMPTY
+        self.maps[n, u, v] = self.PLAYER
+        self.objects[n, self.PLAYER] = np.stack((u, v), -1)
+
+        # check winning conditions
+        is_target = dest > self.PLAYER
+        self.objects[is_target, dest[is_target]] = -1
+        self.n_left -= is_target
+        rewards = is_target.astype(float)
+
+        # check termination conditions: maze hazards, or no targets left
+        any_targets = (self.n_left > 0) | (self.n_targets == 0)
+        dones = ~any_targets | (dest == MazeMap.WALL)
+
+        # reset finished envs
+        self._reset(dones.nonzero()[0])
+
+        self.state = self.update()
+        infos = [{} for _ in range(self.num_envs)]
+        return self.observation(), rewards, dones, infos
+
+    def seed(self, seed=None):
+        # create an instance of the default prgn and draw a seed from it
+        if seed is None:
+            seed = np.random.default_rng().integers(maxsize)
+        self.generator_ = np.random.default_rng(seed)
+        return [seed]
+
+    def close_extras(self, **kwargs):
+        pass
@@ -0,0 +1,106 @@
+import struct
+import numpy as np
+
+
+# full-range BT.601 rgb to YCbCr, with the offsets of the chroma
+YCBCR = np.array([
+    [+0.299, +0.587, +0.114],
+    [-0.168736, -0.331264, +0.5],
+    [+0.5, -0.418688, -0.081312],
+], dtype=np.float32)
+OFFSET = np.array([0., 128., 128.], dtype=np.float32)
+
+# the npy header is reserved up front, and rewritten with the final shape
+NPY_MAGIC, NPY_HEADER = b'\x93NUMPY\x01\x00', 128
+
+
+class VideoSink:
+    """Stream rgb frames of a long rollout to a file.
+
+    Details
+    -------
+    The frames are written as they come, and are never kept in memory. The
+    format is picked by the extension of the path: '.y4m' is uncompressed
+    YUV4MPEG2 video in full-range 4:4:4 YCbCr, which players and `ffmpeg`
+    read directly, and '.npy' is a numpy array of shape `(T, H, W, 3)` that
+    can be memory-mapped by `np.load(path, mmap_mode='r')`.
+
+    All frames must have the same shape. The file is finalized by `.close`.
+    """
+    formats = '.y4m', '.npy'
+
+    def __init__(self, path, *, fps=30):
+        self.format = next((f for f in self.formats if path.endswith(f)), None)
+        assert self.format is not None and fps > 0
+
+        self.path, self.fps = path, fps
+        self.shape, self.n_frames = None, 0
+        self._file = open(path, 'wb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, frame):
+        """Append a `(H, W, 3)` uint8 frame."""
+        assert frame.dtype == np.uint8 and frame.ndim == 3
+        assert frame.shape[-1] == 3
+
+        if self.shape is None:
+            self.shape = frame.shape
+            self._file.write(self.header())
+        assert frame.shape == self.shape
+
+        if self.format == '.y4m':
+            # planar Y, Cb and Cr of the frame (rounded by the `+ 0.5`)
+            pixels = frame.reshape(-1, 3).astype(np.float32)
+            planes = YCBCR @ pixels.T + (OFFSET + 0.5)[:, np.newaxis]
+            frame = np.clip(planes, 0, 255).astype(np.uint8)
+            self._file.write(b'FRAME\n')
+
+        self._file.write(np.ascontiguousarray(frame).data)
+        self.n_frames += 1
+
+    def header(self):
+        if self.format == '.y4m':
+            height, width, _ = self.shape
+            return (f'YUV4MPEG2 W{width} H{height} F{self.fps}:1 Ip A1:1'
+                    ' C444 XCOLORRANGE=FULL\n').encode()
+
+        # the npy header of the current number of frames padded with spaces
+        text = repr(dict(descr='|u1', fortran_order=False,
+                         shape=(self.n_frames, *self.shape)))
+        size = NPY_HEADER - len(NPY_MAGIC) - 2
+        return NPY_MAGIC + struct.pack('<H', size) \
+            + text.ljust(size - 1).encode() + b'\n'
+
+    def close(self):
+        if self._file.closed:
+            return
+
+        if self.format == '.npy' and self.shape is not None:
+            # the header of the same size with the final number of frames
+            self._file.seek(0)
+            self._file.write(self.header())
+
+        self._file.close()
+
+
+def read_y4m(path):
+    """Read the rgb frames of a full-range 4:4:4 YUV4MPEG2 file."""
+    with open(path, 'rb') as f:
+        header = f.readline().split()
+        assert header[0] == b'YUV4MPEG2'
+
+        fields = {p[:1]: p[1:] for p in header[1:]}
+        width, height = int(fields[b'W']), int(fields[b'H'])
+
+        inverse = np.linalg.inv(YCBCR)
+        while f.readline().startswith(b'FRAME'):
+            planes = np.frombuffer(f.read(3 * width * height), np.uint8)
+            planes = planes.reshape(3, height, width) \
+                - OFFSET[:, np.newaxis, np.newaxis]
+            rgb = np.tensordot(planes, inverse, axes=(0, 1))
+            yield np.clip(rgb.round(), 0, 255).astype(np.uint8)
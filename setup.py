@@ -23,7 +23,9 @@ setup(
             'gym_discomaze._maze', [
                 'gym_discomaze/_maze.pyx',
             ], extra_compile_args=[
-                '-O3', '-Ofast',
+                '-O3', '-Ofast', '-fopenmp',
+            ], extra_link_args=[
+                '-fopenmp',
             ], include_dirs=[
                 get_include(),
             ], define_macros=[
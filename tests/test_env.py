@@ -0,0 +1,104 @@
+import tracemalloc
+
+import pytest
+import numpy as np
+
+from gym_discomaze.env import RandomDiscoMaze
+
+
+def play(env, actions):
+    return [env.step(a)[0].copy() for a in actions]
+
+
+def test_restore_frame_stack():
+    env = RandomDiscoMaze(5, 5, generator=7, frame_stack=3, field=(2, 2))
+    env.reset()
+    actions = np.random.default_rng(0).integers(4, size=12).tolist()
+    play(env, actions[:5])
+
+    snapshot = env.snapshot()
+    expected = play(env, actions[5:])
+
+    # the stack after the restore continues the snapshot's, rather than
+    #  the frames before the restore
+    env.reset()
+    play(env, actions[:2])
+    env.restore(snapshot)
+    assert all(map(np.array_equal, play(env, actions[5:]), expected))
+
+    # a snapshot without the stack refills it with the next observation
+    del snapshot['stack']
+    env.restore(snapshot)
+    stack = env.step(actions[5])[0]
+    assert all(np.array_equal(frame, expected[0][-1]) for frame in stack)
+
+
+@pytest.mark.parametrize('config', [
+    dict(), dict(color_stream=True), dict(walls_only=True),
+    dict(obs_format='planes', color_stream=True, frame_stack=2),
+])
+def test_reuse_buffers(config):
+    # the buffers change only the allocations, but not the frames
+    envs = [RandomDiscoMaze(9, 9, generator=5, field=(2, 2), **config,
+                            reuse_buffers=reuse) for reuse in (False, True)]
+    actions = np.random.default_rng(0).integers(4, size=40).tolist()
+    for a in [None, *actions]:
+        obs, other = (env.step(a)[0] for env in envs)
+        assert np.array_equal(obs, other)
+
+
+@pytest.mark.parametrize('config', [
+    dict(color_stream=True), dict(walls_only=True, color_stream=True),
+])
+def test_step_allocations(config):
+    env = RandomDiscoMaze(31, 31, generator=1, field=(2, 2), **config,
+                          reuse_buffers=True)
+    env.reset()
+    for _ in range(8):
+        env.step(None)
+
+    # a steady-state step allocates only small python objects, except for
+    #  the periodic refills of the colour stream
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(32):
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            env.step(None)
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+
+    finally:
+        tracemalloc.stop()
+
+    assert np.median(peaks) < 2048
+
+
+def test_lazy_render_is_passive():
+    envs = [RandomDiscoMaze(7, 7, generator=1, field=(2, 2), n_targets=2,
+                            lazy_render=True) for _ in range(2)]
+    for env in envs:
+        env.step(0)
+
+    # rendering and observing by others does not change the game
+    envs[1].render('state_pixels')
+    envs[1].observation(by=2)
+    for env in envs:
+        env.reset()
+
+    assert np.array_equal(envs[0].maze.map, envs[1].maze.map)
+    assert np.array_equal(envs[0].step(1)[0], envs[1].step(1)[0])
+
+
+def test_lazy_render_windows():
+    env = RandomDiscoMaze(7, 7, generator=3, field=(2, 2), n_targets=3,
+                          lazy_render=True)
+
+    # the windows agree with each other and with the full state, whatever
+    #  the order of painting
+    first, second = env.window(0, 5, 0, 5).copy(), env.window(3, 9, 2, 8)
+    assert np.array_equal(env.state[0:5, 0:5], first)
+    assert np.array_equal(env.state[3:9, 2:8], second)
+
+    eager = RandomDiscoMaze(7, 7, generator=3, field=(2, 2), n_targets=3)
+    assert np.array_equal(env.classes(), eager.classes())
@@ -0,0 +1,99 @@
+import pytest
+import numpy as np
+
+from gym_discomaze.env import RandomDiscoMaze
+from gym_discomaze.ext import ExploreRandomDiscoMaze, MultiAgentDiscoMaze
+from gym_discomaze.record import EpisodeRecorder, EpisodeReader
+
+
+def record(env, n_episodes=3, n_steps=12):
+    """Play random episodes with no-ops, and get the frames of each."""
+    episodes = []
+    for _ in range(n_episodes):
+        frames = [env.reset().copy()]
+        for t in range(n_steps):
+            action = env.action_space.sample() if t % 5 else None
+            obs, _, done, _ = env.step(action)
+            frames.append(obs.copy())
+            if done:
+                break
+
+        episodes.append(np.stack(frames))
+
+    return episodes
+
+
+def assert_replayed(path, episodes):
+    reader = EpisodeReader(path)
+    assert len(reader) == len(episodes)
+    for episode, frames in zip(reader, episodes):
+        assert len(episode) == len(frames)
+        assert np.array_equal(np.stack(list(episode)), frames)
+        for t in range(len(frames)):
+            assert np.array_equal(episode[t], frames[t])
+
+
+@pytest.mark.parametrize('cls', [RandomDiscoMaze, MultiAgentDiscoMaze])
+def test_roundtrip(tmp_path, cls):
+    path = tmp_path / 'episodes.rec'
+    env = EpisodeRecorder(cls(5, 5, generator=3, field=(2, 2)), path,
+                          interval=4)
+    env.action_space.seed(0)
+    episodes = record(env)
+    env.close()
+
+    assert_replayed(path, episodes)
+
+
+def test_roundtrip_frame_stack(tmp_path):
+    path = tmp_path / 'episodes.rec'
+    core = RandomDiscoMaze(5, 5, generator=3, field=(2, 2), frame_stack=3)
+    env = EpisodeRecorder(core, path, interval=4)
+    env.action_space.seed(0)
+    episodes = record(env)
+    env.close()
+
+    # the frames are replayed stacked, also from the checkpoints
+    assert episodes[0].shape[1:] == (3, 5, 5, 3)
+    assert_replayed(path, episodes)
+
+
+def test_roundtrip_lazy_render(tmp_path):
+    path = tmp_path / 'episodes.rec'
+    core = RandomDiscoMaze(5, 5, generator=3, field=(2, 2), lazy_render=True)
+    env = EpisodeRecorder(core, path, interval=4)
+    env.action_space.seed(0)
+
+    # the rendering between the episodes does not change the replay
+    episodes = record(env, n_episodes=1)
+    core.render('state_pixels')
+    episodes += record(env, n_episodes=2)
+    env.close()
+
+    assert_replayed(path, episodes)
+
+
+def test_subclass_rejected(tmp_path):
+    # the reader would replay the explore env without its goals' draws
+    env = ExploreRandomDiscoMaze(5, 5, generator=3)
+    with pytest.raises(AssertionError):
+        EpisodeRecorder(env, tmp_path / 'episodes.rec')
+
+
+def test_roundtrip_reseeded(tmp_path):
+    # the episodes are keyed by the seed at the time of their reset
+    path = tmp_path / 'episodes.rec'
+    env = EpisodeRecorder(RandomDiscoMaze(5, 5, episode_seed=3), path,
+                          interval=4)
+    env.seed(99)
+    env.action_space.seed(0)
+    episodes = record(env, n_episodes=2)
+    env.seed(7)
+    episodes += record(env, n_episodes=2)
+    env.close()
+
+    assert_replayed(path, episodes)
+
+    # any episode is replayed from its index and seed alone
+    frame = RandomDiscoMaze(5, 5, episode_seed=7).reset(episode=1)
+    assert np.array_equal(frame, episodes[-1][0])
@@ -0,0 +1,95 @@
+import pytest
+import numpy as np
+
+from gym_discomaze import _maze
+from gym_discomaze.env import MazeMap, compact_dtype
+
+
+def move_reference(map, i, j, di, dj, targets):
+    """The rules of `RandomDiscoMaze._move` before the compiled kernel."""
+    if di == 0 and dj == 0:
+        # displacing self is always successful
+        return MazeMap.EMPTY, i, j, 0., False
+
+    u, v = i + di, j + dj
+    dest_id = map[u, v]
+    if dest_id in targets or dest_id == MazeMap.WALL:
+        map[u, v] = MazeMap.EMPTY  # consume the target, or displace the wall
+
+    # relocate to non-obstructed cells only
+    if map[u, v] == MazeMap.EMPTY:
+        map[u, v], map[i, j] = map[i, j], MazeMap.EMPTY
+        i, j = u, v
+
+    return dest_id, i, j, float(dest_id in targets), dest_id == MazeMap.WALL
+
+
+@pytest.mark.parametrize('n_ids', [2, 129, 32768, 2**31, 2**40])
+@pytest.mark.parametrize('strided', [False, True])
+def test_move_object(n_ids, strided):
+    rng = np.random.default_rng(n_ids)
+    dtype = compact_dtype(n_ids)
+    high = min(n_ids, 1024)  # the ids near the top of the range
+    for _ in range(500):
+        n, m = rng.integers(2, 8, size=2)
+        map = rng.integers(-1, 3, size=(n, m)).astype(dtype)
+        ids = np.flatnonzero(map > 0)
+        map.flat[ids] = rng.integers(max(n_ids - high, 1), n_ids,
+                                     size=len(ids))
+        if strided:
+            # a non-contiguous transposed view into a larger array
+            base = np.zeros((2 * m, 3 * n), dtype=dtype)
+            base[::2, ::3] = map.T
+            map = base[::2, ::3].T
+
+        # flag a random subset of the present ids as live targets
+        present = np.unique(map[map > 0])
+        targets = set(present[rng.random(len(present)) < 0.5].tolist())
+        is_target = np.zeros(n_ids if n_ids <= 2**16 else 0, dtype=np.uint8)
+        if len(is_target):
+            is_target[list(targets)] = True
+        else:
+            # the flags cannot cover the ids, so none are targets
+            targets = set()
+
+        i, j = rng.integers(n), rng.integers(m)
+        di, dj = [(0, 0), (0, 1), (1, 0), (0, -1), (-1, 0)][rng.integers(5)]
+        if not (0 <= i + di < n and 0 <= j + dj < m):
+            continue
+
+        expected = map.copy()
+        want = move_reference(expected, i, j, di, dj, targets)
+        got = _maze.move_object(map, i, j, di, dj, is_target)
+
+        assert got == want
+        assert np.array_equal(map, expected)
+
+
+def test_move_object_errors():
+    is_target = np.zeros(3, dtype=np.uint8)
+    with pytest.raises(TypeError):
+        _maze.move_object(np.zeros((3, 3), np.uint8), 1, 1, 0, 1, is_target)
+
+    with pytest.raises(TypeError):
+        _maze.move_object(np.zeros((3, 3), np.int8), 1, 1, 0, 1,
+                          is_target.astype(bool))
+
+    with pytest.raises(IndexError):
+        _maze.move_object(np.zeros((3, 3), np.int8), 2, 2, 0, 1, is_target)
+
+
+@pytest.mark.parametrize('dtype', [np.int8, np.int64, np.uint8, np.uint16])
+def test_lookup(dtype):
+    rng = np.random.default_rng(0)
+    table = rng.integers(256, size=(7, 3), dtype=np.uint8)
+
+    # the negative indices count from the end of the table
+    low = -7 if np.issubdtype(dtype, np.signedinteger) else 0
+    index = rng.integers(low, 7, size=(6, 10)).astype(dtype)[:, ::2]
+    out = np.empty((*index.shape, 3), dtype=np.uint8)
+
+    assert _maze.lookup(table, index, out) is out
+    assert np.array_equal(out, np.take(table, index, axis=0))
+
+    with pytest.raises(IndexError):
+        _maze.lookup(table, index + 7, out)